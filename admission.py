@@ -0,0 +1,135 @@
+"""
+Admission control for the routes that call the FPS API.
+
+Upstream-calling requests share a bounded number of slots. When all are
+taken, a bounded number of requests may wait for one, each for at most
+FPS_ADMISSION_MAX_WAIT seconds (never past its router deadline); anything
+beyond that is rejected straight away with 503 and Retry-After instead of
+piling up until the router gives up on it. Cheap routes (health check, test,
+fast) have a separate lane of their own, so a saturated upstream lane never
+starves them.
+"""
+
+import os
+import threading
+import time
+
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('FPS_ADMISSION_MAX_CONCURRENT', 100))
+ADMISSION_QUEUE_SIZE = int(os.environ.get('FPS_ADMISSION_QUEUE_SIZE', 200))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('FPS_ADMISSION_MAX_WAIT', 5))
+ADMISSION_PRIORITY_SLOTS = int(os.environ.get('FPS_ADMISSION_PRIORITY_SLOTS', 50))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('FPS_ADMISSION_RETRY_AFTER', 2))
+
+PRIORITY = "priority"
+UPSTREAM = "upstream"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can neither run nor wait; reason is queue_full, queue_timeout or lane_full."""
+
+    def __init__(self, lane, reason, retry_after=ADMISSION_RETRY_AFTER_SECONDS):
+        super().__init__(f"Server busy ({lane} lane: {reason}), retry in {retry_after}s")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A held slot; release() is idempotent so every exit path may call it."""
+
+    __slots__ = ("lane", "waited", "_released")
+
+    def __init__(self, lane, waited):
+        self.lane = lane
+        self.waited = waited
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.lane.release()
+
+
+class Lane:
+    """Counting semaphore with a bounded wait queue and a maximum wait."""
+
+    def __init__(self, name, limit, queue_size=0, max_wait=0.0):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        self._counters = {"admitted": 0, "queued": 0, "rejected_queue_full": 0,
+                          "rejected_queue_timeout": 0, "wait_seconds": 0.0}
+
+    def acquire(self, max_wait=None):
+        """Take a slot, waiting up to max_wait (capped at the lane's); raise AdmissionRejected otherwise."""
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                self._counters["admitted"] += 1
+                return Ticket(self, 0.0)
+            if self.waiting >= self.queue_size or max_wait <= 0:
+                self._counters["rejected_queue_full"] += 1
+                raise AdmissionRejected(self.name, "queue_full" if self.queue_size else "lane_full")
+
+            self.waiting += 1
+            self._counters["queued"] += 1
+            start = time.monotonic()
+            expires_at = start + max_wait
+            try:
+                while self.active >= self.limit:
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["rejected_queue_timeout"] += 1
+                        raise AdmissionRejected(self.name, "queue_timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - start
+            self.active += 1
+            self._counters["admitted"] += 1
+            self._counters["wait_seconds"] += waited
+            return Ticket(self, waited)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            counters = dict(self._counters)
+            counters["wait_seconds"] = round(counters["wait_seconds"], 3)
+            return dict(counters, limit=self.limit, active=self.active, waiting=self.waiting,
+                        queue_size=self.queue_size, max_wait_seconds=self.max_wait)
+
+
+class AdmissionController:
+    """The upstream lane plus the reserved priority lane for cheap routes."""
+
+    def __init__(self, max_concurrent=ADMISSION_MAX_CONCURRENT, queue_size=ADMISSION_QUEUE_SIZE,
+                 max_wait=ADMISSION_MAX_WAIT_SECONDS, priority_slots=ADMISSION_PRIORITY_SLOTS):
+        self.lanes = {
+            UPSTREAM: Lane(UPSTREAM, max_concurrent, queue_size, max_wait),
+            PRIORITY: Lane(PRIORITY, priority_slots),
+        }
+
+    @property
+    def enabled(self):
+        return self.lanes[UPSTREAM].limit > 0
+
+    def admit(self, lane, max_wait=None):
+        """Ticket for a slot in lane, or None when admission control is off."""
+        if not self.enabled:
+            return None
+        return self.lanes[lane].acquire(max_wait)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
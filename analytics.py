@@ -0,0 +1,288 @@
+"""
+Cross-run analytics over perfrun durations and task timings.
+
+Each run's "43m48s"-style duration strings are parsed once into NumPy columns
+(task name ID, duration in seconds, task outcome where the task has one)
+plus the run's own outcome, and kept per run ID and content version, so
+adding a run to a query only parses that run. Queries concatenate the
+columns of the requested runs and compute everything with vectorized
+operations: per-task percentiles, regressions against a baseline run and the
+pass-rate trend across runs (from each run's result_status).
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+ANALYTICS_MAX_RUNS = int(os.environ.get('FPS_ANALYTICS_MAX_RUNS', 500))
+# A task regressed when it got this much slower than in the baseline (ratio and absolute)
+REGRESSION_RATIO = float(os.environ.get('FPS_ANALYTICS_REGRESSION_RATIO', 0.1))
+REGRESSION_MIN_SECONDS = float(os.environ.get('FPS_ANALYTICS_REGRESSION_MIN_SECONDS', 1))
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+DURATION_UNITS = {"d": 86400.0, "h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001, "us": 1e-6}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|us|d|h|m|s)")
+
+# result_status of a run or task -> outcome value
+PASSED, FAILED, NO_RESULT = 1, 0, -1
+PASSING_RESULTS = frozenset(["PASSED", "SUCCESS"])
+FAILING_RESULTS = frozenset(["FAILED", "FAILURE", "ERROR"])
+
+
+@lru_cache(maxsize=4096)
+def parse_duration(text):
+    """
+    "43m48s" / "1h2m3s" / "850ms" / "12.5s" -> seconds as a float; NaN when
+    text is missing or unparseable. Plain numbers are taken as seconds.
+    Cached, since the same strings repeat across tasks and runs.
+    """
+    if text is None:
+        return float("nan")
+    if isinstance(text, (int, float)):
+        return float(text)
+    text = text.strip().lower().replace(" ", "")
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    total = 0.0
+    position = 0
+    for match in DURATION_PART.finditer(text):
+        if match.start() != position:
+            return float("nan")
+        total += float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        position = match.end()
+    return total if position and position == len(text) else float("nan")
+
+
+def _outcome(result_status):
+    # Anything else (missing, still running, unknown) has no result yet
+    if result_status in PASSING_RESULTS:
+        return PASSED
+    return FAILED if result_status in FAILING_RESULTS else NO_RESULT
+
+
+class RunColumns:
+    """One run's parsed columns plus its run-level fields."""
+
+    __slots__ = ("run_id", "version", "status", "result_status", "outcome", "duration", "task_ids",
+                 "durations", "outcomes")
+
+    def __init__(self, run_id, version, status, result_status, duration, task_ids, durations, outcomes):
+        self.run_id = run_id
+        self.version = version
+        self.status = status
+        self.result_status = result_status
+        self.outcome = _outcome(result_status)
+        self.duration = duration
+        self.task_ids = task_ids
+        self.durations = durations
+        self.outcomes = outcomes
+
+    def task_pass_rate(self):
+        """Share of the tasks with their own result_status that passed; None when no task has one."""
+        decided = self.outcomes != NO_RESULT
+        return _number(np.mean(self.outcomes[decided] == PASSED)) if decided.any() else None
+
+    def summary(self):
+        return {
+            "perfrun_status": self.status,
+            "result_status": self.result_status,
+            "duration_seconds": _number(self.duration),
+            "tasks": int(self.task_ids.size),
+            "task_pass_rate": self.task_pass_rate(),
+        }
+
+
+class ColumnStore:
+    """
+    Parsed columns per run ID, LRU bounded. Task names are interned to integer
+    IDs shared by all runs so columns from different runs line up.
+    """
+
+    def __init__(self, max_runs=ANALYTICS_MAX_RUNS):
+        self.max_runs = max_runs
+        self._runs = OrderedDict()
+        self._names = []
+        self._name_ids = {}
+        self._lock = threading.Lock()
+        self._counters = {"parsed": 0, "reused": 0, "evictions": 0}
+
+    def _intern(self, name):
+        # Caller holds self._lock
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def add(self, run_id, payload, version=None):
+        """Columns for run_id, parsed from payload unless this version is already stored."""
+        with self._lock:
+            columns = self._runs.get(run_id)
+            if columns is not None and version is not None and columns.version == version:
+                self._runs.move_to_end(run_id)
+                self._counters["reused"] += 1
+                return columns
+
+        perfrun = ((payload or {}).get("perfruns") or [{}])[0]
+        tasks = perfrun.get("perfrun_tasks") or []
+        names = [task.get("name") or f"#{index}" for index, task in enumerate(tasks)]
+        durations = np.fromiter((parse_duration(task.get("duration")) for task in tasks),
+                                dtype=np.float64, count=len(tasks))
+        outcomes = np.fromiter((_outcome(task.get("result_status")) for task in tasks),
+                               dtype=np.int8, count=len(tasks))
+        with self._lock:
+            task_ids = np.fromiter((self._intern(name) for name in names), dtype=np.int32, count=len(names))
+            columns = RunColumns(run_id, version, perfrun.get("status"), perfrun.get("result_status"),
+                                 parse_duration(perfrun.get("perfrun_duration")), task_ids, durations, outcomes)
+            self._runs[run_id] = columns
+            self._runs.move_to_end(run_id)
+            self._counters["parsed"] += 1
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+                self._counters["evictions"] += 1
+        return columns
+
+    def analyze(self, run_ids, baseline=None, percentiles=DEFAULT_PERCENTILES,
+                regression_ratio=REGRESSION_RATIO, regression_min_seconds=REGRESSION_MIN_SECONDS):
+        """Aggregates over the stored runs in run_ids (in that order); see the module docstring."""
+        with self._lock:
+            runs = [self._runs[run_id] for run_id in run_ids if run_id in self._runs]
+            names = list(self._names)
+        report = {
+            "runs": len(runs),
+            "tasks": task_percentiles(runs, names, percentiles),
+            "perfrun_duration": _percentile_summary(np.array([run.duration for run in runs]), percentiles),
+            "pass_rate": pass_rate_trend(runs),
+        }
+        if baseline is not None:
+            base = next((run for run in runs if run.run_id == baseline), None)
+            report["regressions"] = regressions(base, runs, names, regression_ratio,
+                                                regression_min_seconds) if base else None
+        return report
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, runs=len(self._runs), max_runs=self.max_runs,
+                        task_names=len(self._names))
+
+
+def _number(value):
+    """JSON-friendly float (None for NaN), rounded to milliseconds."""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 3)
+
+
+def _nearest_rank(sorted_values, starts, counts, pct):
+    """Nearest-rank pct percentile of every group [start, start + count) of sorted_values at once."""
+    ranks = np.maximum(np.ceil(pct / 100.0 * counts).astype(np.int64) - 1, 0)
+    return sorted_values[starts + ranks]
+
+
+def _percentile_summary(values, percentiles):
+    values = np.sort(values[~np.isnan(values)])
+    if not values.size:
+        return None
+    summary = {"count": int(values.size), "mean_seconds": _number(values.mean()),
+               "min_seconds": _number(values[0]), "max_seconds": _number(values[-1])}
+    for pct in percentiles:
+        summary[f"p{pct:g}_seconds"] = _number(_nearest_rank(values, 0, values.size, pct))
+    return summary
+
+
+def task_percentiles(runs, names, percentiles=DEFAULT_PERCENTILES):
+    """Per task name: count, mean, min, max and the requested percentiles of its durations across runs."""
+    if not runs:
+        return {}
+    task_ids = np.concatenate([run.task_ids for run in runs])
+    durations = np.concatenate([run.durations for run in runs])
+    known = ~np.isnan(durations)
+    task_ids, durations = task_ids[known], durations[known]
+    if not task_ids.size:
+        return {}
+
+    # Group by task, durations ascending within each group
+    order = np.lexsort((durations, task_ids))
+    task_ids, durations = task_ids[order], durations[order]
+    group_ids, starts, counts = np.unique(task_ids, return_index=True, return_counts=True)
+    columns = {
+        "count": counts,
+        "mean_seconds": np.add.reduceat(durations, starts) / counts,
+        "min_seconds": durations[starts],
+        "max_seconds": durations[starts + counts - 1],
+    }
+    for pct in percentiles:
+        columns[f"p{pct:g}_seconds"] = _nearest_rank(durations, starts, counts, pct)
+
+    result = {}
+    for index, name_id in enumerate(group_ids):
+        result[names[name_id]] = {
+            key: int(values[index]) if key == "count" else _number(values[index])
+            for key, values in columns.items()
+        }
+    return result
+
+
+def regressions(base, runs, names, ratio=REGRESSION_RATIO, min_seconds=REGRESSION_MIN_SECONDS):
+    """Per run: tasks at least `ratio` and `min_seconds` slower than in base, slowest first."""
+    # Dense baseline lookup indexed by task name ID (NaN where the baseline lacks the task)
+    baseline = np.full(len(names), np.nan)
+    baseline[base.task_ids] = base.durations
+    report = {"baseline": base.run_id, "ratio": ratio, "min_seconds": min_seconds, "runs": {}}
+    for run in runs:
+        if run is base:
+            continue
+        before = baseline[run.task_ids]
+        delta = run.durations - before
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = delta / before
+        slower = (delta >= min_seconds) & (change >= ratio)  # NaN compares False
+        indexes = np.flatnonzero(slower)
+        indexes = indexes[np.argsort(-delta[indexes], kind="stable")]
+        report["runs"][run.run_id] = [
+            {
+                "name": names[run.task_ids[index]],
+                "baseline_seconds": _number(before[index]),
+                "seconds": _number(run.durations[index]),
+                "delta_seconds": _number(delta[index]),
+                "change": _number(change[index]),
+            }
+            for index in indexes
+        ]
+    return report
+
+
+def pass_rate_trend(runs):
+    """
+    Run outcomes (result_status) in the given order: share of the runs with a
+    result that passed, its linear trend per run, and each run's task-level
+    pass rate where tasks carry a result_status of their own.
+    """
+    if not runs:
+        return None
+    outcomes = np.array([run.outcome for run in runs], dtype=np.int8)
+    decided = outcomes != NO_RESULT
+    passed = outcomes[decided] == PASSED
+
+    slope = None
+    if decided.sum() >= 2:
+        slope = _number(np.polyfit(np.flatnonzero(decided), passed.astype(np.float64), 1)[0])
+    return {
+        "runs": [
+            {
+                "run_id": run.run_id,
+                "result_status": run.result_status,
+                "passed": None if run.outcome == NO_RESULT else run.outcome == PASSED,
+                "task_pass_rate": run.task_pass_rate(),
+            }
+            for run in runs
+        ],
+        "runs_with_result": int(decided.sum()),
+        "overall": _number(passed.mean()) if passed.size else None,
+        "slope_per_run": slope,
+    }
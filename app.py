@@ -3,149 +3,481 @@ FPS API Client - Simple Heroku service with hardcoded values.
 """
 
 import os
-from flask import Flask, jsonify
+import json
+import math
+from flask import Flask, Response, g, jsonify, request, url_for
+from flask.json.provider import DefaultJSONProvider
 import requests
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+import threading
 import uuid
+from werkzeug.http import is_resource_modified
 
-# Configure logging for Heroku
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s [%(name)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+from admission import PRIORITY, UPSTREAM, AdmissionController, AdmissionRejected
+from batch import BatchFetcher
+from breaker import OPEN, CircuitOpenError
+from deadline import MIN_UPSTREAM_SECONDS, Deadline, request_deadline
+from events import EventHub
+from fastjson import StaticJSON
+from cache import ResponseCache
+from compression import ResponseCompressor
+from jobs import JobManager, JobQueueFull
+import logpipeline
+import metrics
+from logpipeline import access_log
+from prefetch import PREFETCH_RUN_IDS, PrefetchScheduler
+from prober import ConnectivityProber
+from projection import from_query as projection_from_query
+from upstream import FPSAPIError, FPSClient, is_valid_run_id
+
+# Configure logging for Heroku: queued, written to stdout by a background thread
+logpipeline.configure()
 logger = logging.getLogger(__name__)
 
 # Disable SSL warnings
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that records response serialization time."""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.timer("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 
 # Hardcoded values
 HARDCODED_RUN_ID = "2915731b-62f7-490f-bc24-2b4c583c7ff2"
 HARDCODED_TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCIgOiAiSldUIiwia2lkIiA6ICJ6VFhTQTFRR1hrNkhFY2YxclJGVktoZVNmeEVOT3JDLUhBRlBPcmkyWm5NIn0.eyJleHAiOjE3NjAyMDAwNzYsImlhdCI6MTc1NzUyMTY3NiwianRpIjoiMWZmNTQ2ODAtZjk0MS00ZDg0LWI5NTAtZDA0NzBlNDMxYmFlIiwiaXNzIjoiaHR0cHM6Ly9xdWFudHVtay1oYS5mb3VuZGF0aW9uLnBlcmYxLXVzZWFzdDIuYXdzLnNmZGMuY2wvYXV0aC9yZWFsbXMvY2VudHJhbHBlcmZmb3VuZGF0aW9uIiwiYXVkIjoiY3BmLW1lcmxpbi1vaWRjIiwic3ViIjoiZjphMnpyZGZMN1N0NjYzUGpGMlhrQmtROnN5YXRoaXJhanUiLCJ0eXAiOiJJRCIsImF6cCI6ImNwZi1tZXJsaW4tb2lkYyIsInNpZCI6IjdhNWIzOGQ3LTA0ZDEtNDc0OC05MDc0LTMwNTE0MzhlZWFiNCIsImF0X2hhc2giOiJmTXZoSTRyWUk4VVNBUDVoajhYd1JRIiwiZW1wbG95ZWVfdHlwZSI6ImVtcGxveWVlIiwiZW1haWxfdmVyaWZpZWQiOmZhbHNlLCJyZWFsbV9hY2Nlc3MiOnsicm9sZXMiOlsib2ZmbGluZV9hY2Nlc3MiLCJkZWZhdWx0LXJvbGVzLWNlbnRyYWxwZXJmZm91bmRhdGlvbiIsInVtYV9hdXRob3JpemF0aW9uIl19LCJuYW1lIjoiU2FjaGluIFlhdGhpcmFqdSBzeWF0aGlyYWp1IiwicHJlZmVycmVkX3VzZXJuYW1lIjoic3lhdGhpcmFqdSIsImdpdmVuX25hbWUiOiJTYWNoaW4gWWF0aGlyYWp1IiwiZmFtaWx5X25hbWUiOiJzeWF0aGlyYWp1IiwiZW1haWwiOiJzeWF0aGlyYWp1QHNhbGVzZm9yY2UuY29tIiwiY2xpZW50SWRlbnRpdHkiOiJjcGYtbWVybGluLW9pZGMifQ.na2y_Xo3vwiIBY7PCf_0fLd5RENGB8F-eQV6acwUhrvy5keFlPVtv1RgXPkd5XtvhxASrlnxlmEGlNt1R2KL0BfxF-2_egOPfivsPu2XkywyYB7qmYuEv0ASYmxbh0eGsr1kSuDm2QKSkPEkSkj-gdsWM_7hnC7VpzUTUXYGFBPBMS43uBV2y7lsZwDWok5v7ZCsWjywWiKqwPX6Cspl2Wkja0dnw5IM31dTc9NdPUDVHyrLA2fHRHgyIO36gJTMqXbjZnkykstw-NR1ZbS5ttQ64wkTQvBhGe5REARvpjqj5-itEyaFavbN99WKbj9lwdVd4Zt84UxFym1V5bIn5w"
 
-@app.route('/')
-def health_check():
-    """Health check endpoint."""
-    return jsonify({
-        "status": "healthy",
-        "service": "FPS API Client (Hardcoded)",
-        "version": "2.0.0",
-        "description": "Simple Heroku service with hardcoded FPS API call",
-        "endpoints": {
-            "health": "/",
-            "get_fps_data": "/api/v1/fps",
-            "get_fps_fast": "/api/v1/fps/fast", 
-            "test": "/api/v1/test",
-            "connectivity_test": "/api/v1/connectivity"
-        },
+# Pooled keep-alive upstream client, built once per worker and shared by every route
+fps_client = FPSClient(token=HARDCODED_TOKEN)
+
+# Last-known perfrun payloads keyed by run ID (TTL + LRU, stale-while-revalidate)
+fps_cache = ResponseCache()
+
+# Background executor for slow lookups that must not hold a router connection
+fps_jobs = JobManager()
+JOB_READ_TIMEOUT = float(os.environ.get('FPS_JOB_READ_TIMEOUT', 60))
+
+# Passthrough mode: splice raw upstream bytes into the response instead of parse + re-encode
+PASSTHROUGH_DEFAULT = os.environ.get('FPS_PASSTHROUGH', '0')
+PASSTHROUGH_CHUNK_SIZE = int(os.environ.get('FPS_PASSTHROUGH_CHUNK_SIZE', 64 * 1024))
+# Streamed bodies up to this size are also kept and cached once complete (0 = never cache them)
+PASSTHROUGH_CACHE_MAX_BYTES = int(os.environ.get('FPS_PASSTHROUGH_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+# Bounded parallel fan-out for multi-run lookups
+fps_batch = BatchFetcher()
+
+# Parsed duration/outcome columns per run ID for /api/v1/perfruns:analytics. Built on
+# first use, so workers that never serve analytics do not pay for importing numpy.
+_analytics_store = None
+_analytics_lock = threading.Lock()
+
+
+def analytics_store():
+    global _analytics_store
+    if _analytics_store is None:
+        with _analytics_lock:
+            if _analytics_store is None:
+                from analytics import ColumnStore
+                _analytics_store = ColumnStore()
+    return _analytics_store
+
+# Background DNS/TCP/HEAD probe feeding /api/v1/connectivity with rolling stats
+fps_prober = ConnectivityProber(fps_client, HARDCODED_RUN_ID)
+fps_prober.start()
+
+# Change streams for /api/v1/perfruns/<run_id>/events: one upstream poller per run ID
+fps_events = EventHub(lambda run_id: fetch_into_cache(run_id).payload)
+
+# gzip/brotli per Accept-Encoding (streamed responses are compressed chunk by chunk)
+fps_compressor = ResponseCompressor()
+
+# Keeps the hardcoded, configured and popular run IDs warm (started once the routes are defined)
+fps_prefetch = PrefetchScheduler(fps_cache, lambda run_id: fetch_into_cache(run_id, timeout=(5, 20)),
+                                 pinned=[HARDCODED_RUN_ID] + PREFETCH_RUN_IDS)
+
+# Bounded slots + wait queue for upstream-calling routes; cheap routes get their own lane
+fps_admission = AdmissionController()
+PRIORITY_ENDPOINTS = frozenset(["health_check", "test_endpoint", "get_fps_data_fast",
+                                "get_fps_job", "get_stats", "get_metrics"])
+# SSE clients hold their connection for minutes but share one poller per run ID
+UNLIMITED_ENDPOINTS = frozenset(["stream_perfrun_events", "static"])
+
+
+@app.before_request
+def begin_request():
+    # Reuse the Heroku router's request ID so our logs line up with the router's
+    g.request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+    access_log.begin(g.request_id)
+    return admit_request()
+
+
+def admit_request():
+    """Take an admission slot for this request, or answer 503 right away."""
+    if request.endpoint is None or request.endpoint in UNLIMITED_ENDPOINTS:
+        return None
+    if request.endpoint in PRIORITY_ENDPOINTS:
+        # The priority lane never queues, so there is no wait to bound
+        lane, max_wait = PRIORITY, None
+    else:
+        # Waiting only makes sense while enough of the router budget is left to do the work
+        lane = UPSTREAM
+        max_wait = request_deadline(request.headers).remaining() - MIN_UPSTREAM_SECONDS
+    try:
+        g.admission = fps_admission.admit(lane, max_wait)
+    except AdmissionRejected as e:
+        access_log.note(admission=e.reason)
+        response = jsonify({
+            "request_id": g.request_id,
+            "status": "error",
+            "error": "Server is at capacity, retry shortly",
+            "error_type": "overloaded"
+        })
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+    if g.admission is not None and g.admission.waited:
+        access_log.note(admission_wait_ms=round(g.admission.waited * 1000, 1))
+    return None
+
+
+@app.after_request
+def release_admission(response):
+    # Hold the slot until the body has been sent (streamed responses included)
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        response.call_on_close(ticket.release)
+    return response
+
+
+@app.teardown_request
+def release_admission_on_error(error):
+    # Safety net for requests that never got as far as after_request
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        ticket.release()
+
+
+# Registered before compress_response so it runs after it and sees the final response
+@app.after_request
+def log_request(response):
+    return access_log.finish(request, response)
+
+
+@app.after_request
+def compress_response(response):
+    return fps_compressor.apply(request, response)
+
+
+def revalidation_headers(entry):
+    """Validators from a cached entry, turning the upstream GET into a conditional one."""
+    if entry is None:
+        return {}
+    return {"etag": entry.upstream_etag, "last_modified": entry.upstream_last_modified}
+
+
+def store_perfrun(run_id, response, previous):
+    """Cache a 200 response, or renew the previous entry on 304 Not Modified."""
+    if response.status_code == 304 and previous is not None:
+        return fps_cache.touch(run_id) or fps_cache.set(
+            run_id, previous.payload, previous.upstream_etag, previous.upstream_last_modified)
+    with metrics.timer("parse"):
+        payload = response.json()
+    return fps_cache.set(run_id, payload,
+                         upstream_etag=response.headers.get("ETag"),
+                         upstream_last_modified=response.headers.get("Last-Modified"))
+
+
+def fetch_into_cache(run_id, timeout=(5, 20), deadline=None):
+    """Fetch (or revalidate) a perfrun upstream and cache it; raises FPSAPIError on failure."""
+    previous = fps_cache.peek(run_id)
+    response = fps_client.get_perfrun(run_id, timeout=timeout, deadline=deadline,
+                                      **revalidation_headers(previous))
+    if response.status_code == 200 or (response.status_code == 304 and previous is not None):
+        return store_perfrun(run_id, response, previous)
+    raise FPSAPIError(response.status_code, response.text)
+
+
+def refresh_perfrun(run_id):
+    """Background cache refresh; stores the result itself."""
+    try:
+        fetch_into_cache(run_id, timeout=(5, 20))
+    except FPSAPIError as e:
+        logger.error(f"♻️ Background refresh for {run_id} got FPS API status {e.status_code}")
+        return None
+    except CircuitOpenError:
+        logger.info(f"♻️ Background refresh for {run_id} skipped, circuit open")
+        return None
+    logger.info(f"♻️ Background refresh for {run_id} completed")
+    return None
+
+
+def run_fetch_job(run_id):
+    """Job body: fetch a perfrun without the router deadline and cache the result."""
+    return fetch_into_cache(run_id, timeout=(5, JOB_READ_TIMEOUT)).payload
+
+
+def fetch_batch_entry(run_id, remaining):
+    """
+    Cache entry for one run of a batch: fresh cache hit, else an upstream fetch
+    inside the batch deadline (or the last-known copy while the circuit is open).
+    """
+    fps_prefetch.note_request(run_id)
+    entry, state = fps_cache.lookup(run_id)
+    if state == "fresh":
+        return entry
+    try:
+        return fetch_into_cache(run_id, deadline=Deadline(remaining))
+    except CircuitOpenError:
+        entry = fps_cache.peek(run_id)
+        if entry is None:
+            raise
+        return entry
+
+
+def parse_run_batch(body, baseline=False):
+    """
+    Validate a {"run_ids": [...], "deadline_seconds": optional} body, plus an
+    optional "baseline" run ID when baseline is True. Returns (run_ids,
+    deadline_seconds, error): the run IDs de-duplicated in order (a baseline
+    not among them goes first) and the deadline capped at this request's
+    router budget, or the message for a 400 response.
+    """
+    if not isinstance(body, dict):
+        return None, None, "Body must be a JSON object"
+    run_ids = body.get("run_ids")
+    if not isinstance(run_ids, list) or not run_ids or not all(map(is_valid_run_id, run_ids)):
+        return None, None, "Body must be JSON with a non-empty 'run_ids' list of run IDs (letters, digits and dashes)"
+    base = body.get("baseline") if baseline else None
+    if base is not None:
+        if not is_valid_run_id(base):
+            return None, None, "'baseline' must be a run ID"
+        if base not in run_ids:
+            run_ids = [base] + run_ids
+    run_ids = list(dict.fromkeys(run_ids))
+    if len(run_ids) > fps_batch.max_runs:
+        return None, None, f"At most {fps_batch.max_runs} run IDs per request"
+    deadline = body.get("deadline_seconds", fps_batch.deadline)
+    try:
+        deadline = None if isinstance(deadline, bool) else float(deadline)
+    except (TypeError, ValueError):
+        deadline = None
+    # NaN would slip through min() below and drop the router budget cap
+    if deadline is None or not math.isfinite(deadline) or deadline <= 0:
+        return None, None, "'deadline_seconds' must be a positive number"
+    # Never run past the router budget of this request
+    return run_ids, min(deadline, request_deadline(request.headers).remaining()), None
+
+
+def fetch_batch_run(run_id, remaining):
+    """Batch body for one run: its perfrun payload."""
+    return fetch_batch_entry(run_id, remaining).payload
+
+
+def fetch_analytics_run(run_id, remaining):
+    """Analytics body for one run: parse it into columns (unless this version already is) and summarize."""
+    entry = fetch_batch_entry(run_id, remaining)
+    return analytics_store().add(run_id, entry.payload, version=entry.etag).summary()
+
+
+def entity_tag(entry, projection=None):
+    """Client-facing ETag; each projection of the same payload is its own variant."""
+    return entry.etag if projection is None else f"{entry.etag}-{projection.tag}"
+
+
+def not_modified(entry, projection=None):
+    """304 response if the client's If-None-Match / If-Modified-Since still match entry, else None."""
+    last_modified = datetime.fromtimestamp(entry.modified_at, timezone.utc)
+    if is_resource_modified(request.environ, etag=entity_tag(entry, projection), last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), entry, projection)
+
+
+def with_validators(response, entry, projection=None):
+    """Attach the cached entry's ETag (weak: the envelope differs per request) and Last-Modified."""
+    response.set_etag(entity_tag(entry, projection), weak=True)
+    response.last_modified = datetime.fromtimestamp(entry.modified_at, timezone.utc)
+    return response
+
+
+def project(payload, projection):
+    """Apply a compiled ?fields= / task filter projection, if any."""
+    return payload if projection is None else projection.apply(payload)
+
+
+def passthrough_response(request_id, start_time, upstream_response):
+    """
+    Stream the metadata envelope, then the upstream body chunk by chunk as fps_data.
+    The FPS API's validators are forwarded, so clients can revalidate with a 304.
+    Bodies up to PASSTHROUGH_CACHE_MAX_BYTES are cached once fully streamed;
+    larger ones are never parsed or copied as a whole.
+    """
+    upstream_etag = upstream_response.headers.get("ETag")
+    upstream_last_modified = upstream_response.headers.get("Last-Modified")
+    envelope = json.dumps({
+        "request_id": request_id,
+        "timestamp": start_time.isoformat(),
+        "status": "success",
+        "time_to_upstream_headers_ms": int((datetime.now() - start_time).total_seconds() * 1000),
+        "data_type": "passthrough",
         "hardcoded_values": {
             "run_id": HARDCODED_RUN_ID,
-            "token_preview": HARDCODED_TOKEN[:50] + "..."
+            "token_used": "✓ Hardcoded token"
         }
     })
 
+    def generate():
+        kept = [] if PASSTHROUGH_CACHE_MAX_BYTES > 0 else None
+        kept_bytes = 0
+        try:
+            yield envelope[:-1] + ', "fps_data": '
+            for chunk in upstream_response.iter_content(chunk_size=PASSTHROUGH_CHUNK_SIZE):
+                if kept is not None:
+                    kept_bytes += len(chunk)
+                    if kept_bytes <= PASSTHROUGH_CACHE_MAX_BYTES:
+                        kept.append(chunk)
+                    else:
+                        kept = None  # too large to cache; keep memory flat
+                yield chunk
+            yield "}"
+        except requests.exceptions.RequestException as e:
+            # Headers are already sent; the truncated body tells the client the transfer failed
+            logger.error(f"💥 [REQUEST:{request_id}] Passthrough aborted mid-stream: {str(e)}")
+            kept = None
+        finally:
+            upstream_response.close()
+        if kept is not None:
+            try:
+                with metrics.timer("parse"):
+                    payload = json.loads(b"".join(kept))
+            except ValueError as e:
+                logger.error(f"💥 [REQUEST:{request_id}] Passthrough body not cached: {str(e)}")
+            else:
+                fps_cache.set(HARDCODED_RUN_ID, payload, upstream_etag=upstream_etag,
+                              upstream_last_modified=upstream_last_modified)
+
+    response = Response(generate(), mimetype="application/json", headers={"X-Request-ID": request_id})
+    # Same client-facing validators the cached entry will carry (see ResponseCache.set)
+    if upstream_etag:
+        response.set_etag(upstream_etag.removeprefix('W/').strip('"'), weak=True)
+    if upstream_last_modified:
+        response.headers["Last-Modified"] = upstream_last_modified
+    return response
+
+
+def cache_info(entry, state):
+    """Cache metadata attached to responses served from fps_cache."""
+    return {
+        "state": state,
+        "age_seconds": round(entry.age(), 1),
+        "fetched_at": datetime.fromtimestamp(entry.fetched_at).isoformat()
+    }
+
+# Health check and test bodies never change apart from a field or two: serialized once here,
+# with status / upstream_circuit / timestamp appended per request
+HEALTH_BODY = StaticJSON({
+    "service": "FPS API Client (Hardcoded)",
+    "version": "2.0.0",
+    "description": "Simple Heroku service with hardcoded FPS API call",
+    "endpoints": {
+        "health": "/",
+        "get_fps_data": "/api/v1/fps",
+        "get_fps_fast": "/api/v1/fps/fast",
+        "test": "/api/v1/test",
+        "connectivity_test": "/api/v1/connectivity",
+        "fps_jobs": "/api/v1/fps/jobs",
+        "perfruns_batch": "/api/v1/perfruns:batch",
+        "perfruns_analytics": "/api/v1/perfruns:analytics",
+        "perfrun_events": "/api/v1/perfruns/<run_id>/events",
+        "metrics": "/metrics",
+        "stats": "/api/v1/stats"
+    },
+    "hardcoded_values": {
+        "run_id": HARDCODED_RUN_ID,
+        "token_preview": HARDCODED_TOKEN[:50] + "..."
+    }
+})
+TEST_BODY = StaticJSON({
+    "status": "success",
+    "message": "Test endpoint working!",
+    "hardcoded_values": {
+        "run_id": HARDCODED_RUN_ID,
+        "token_length": len(HARDCODED_TOKEN)
+    }
+})
+
+@app.route('/')
+def health_check():
+    """Health check endpoint."""
+    circuit = fps_client.breaker.snapshot()
+    body = HEALTH_BODY.render(status="degraded" if circuit["state"] == OPEN else "healthy",
+                              upstream_circuit=circuit)
+    return Response(body, mimetype="application/json")
+
 @app.route('/api/v1/test', methods=['GET'])
 def test_endpoint():
     """Quick test endpoint that doesn't call external APIs."""
-    return jsonify({
-        "status": "success",
-        "message": "Test endpoint working!",
-        "timestamp": datetime.now().isoformat(),
-        "hardcoded_values": {
-            "run_id": HARDCODED_RUN_ID,
-            "token_length": len(HARDCODED_TOKEN)
-        }
-    })
+    return Response(TEST_BODY.render(timestamp=datetime.now().isoformat()), mimetype="application/json")
 
 @app.route('/api/v1/connectivity', methods=['GET'])
 def test_connectivity():
     """
-    Test connectivity to FPS API without making the full request.
+    Report FPS API connectivity from the background prober's rolling window.
     This helps diagnose if the issue is connectivity or API response time.
+    Pass ?live=1 to run a fresh probe first (also done before the first background probe).
     """
-    request_id = str(uuid.uuid4())
+    request_id = g.request_id
     start_time = datetime.now()
     
-    logger.info(f"🔍 [REQUEST:{request_id}] Testing FPS API connectivity")
+    sample = fps_prober.latest()
+    live = request.args.get("live") == "1" or sample is None
+    if live:
+        access_log.note(live_probe=True)
+        sample = fps_prober.probe_once()
     
-    try:
-        import socket
-        from urllib.parse import urlparse
-        
-        # Test 1: DNS Resolution
-        url = f"https://performance.sfproxy.core1.perf1-useast2.aws.sfdc.cl/api/v1/perfruns/{HARDCODED_RUN_ID}"
-        parsed_url = urlparse(url)
-        hostname = parsed_url.hostname
-        
-        dns_start = datetime.now()
-        ip_address = socket.gethostbyname(hostname)
-        dns_time = int((datetime.now() - dns_start).total_seconds() * 1000)
-        
-        # Test 2: TCP Connection
-        tcp_start = datetime.now()
-        sock = socket.create_connection((hostname, 443), timeout=5)
-        tcp_time = int((datetime.now() - tcp_start).total_seconds() * 1000)
-        sock.close()
-        
-        # Test 3: HTTP HEAD (quick test)
-        head_start = datetime.now()
-        headers = {
-            "accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"bearer {HARDCODED_TOKEN}"
+    total_time = int((datetime.now() - start_time).total_seconds() * 1000)
+    body = {
+        "request_id": request_id,
+        "timestamp": start_time.isoformat(),
+        "status": "success" if sample["ok"] else "error",
+        "total_time_ms": total_time,
+        "probe": {
+            "live": live,
+            "probed_at": sample["timestamp"],
+            "probe_time_ms": sample["total_ms"]
+        },
+        "rolling": fps_prober.summary()
+    }
+    
+    if not sample["ok"]:
+        if live:
+            logger.error(f"❌ [REQUEST:{request_id}] Connectivity test failed: {sample['error']}")
+        body["error"] = sample["error"]
+        body["diagnosis"] = "API endpoint is not reachable from this server"
+        return jsonify(body), 500
+    
+    body["tests"] = {
+        "dns_resolution": {
+            "hostname": sample["hostname"],
+            "ip_address": sample["ip_address"],
+            "time_ms": sample["dns_ms"]
+        },
+        "tcp_connection": {
+            "host": f"{sample['hostname']}:{sample['port']}",
+            "time_ms": sample["tcp_ms"]
+        },
+        "http_head": {
+            "status_code": sample["status_code"],
+            "time_ms": sample["head_ms"]
         }
-        
-        response = requests.head(
-            url=url,
-            headers=headers,
-            verify=False,
-            timeout=(3, 5)
-        )
-        head_time = int((datetime.now() - head_start).total_seconds() * 1000)
-        
-        total_time = int((datetime.now() - start_time).total_seconds() * 1000)
-        
-        logger.info(f"✅ [REQUEST:{request_id}] Connectivity test successful")
-        
-        return jsonify({
-            "request_id": request_id,
-            "timestamp": start_time.isoformat(),
-            "status": "success",
-            "total_time_ms": total_time,
-            "tests": {
-                "dns_resolution": {
-                    "hostname": hostname,
-                    "ip_address": ip_address,
-                    "time_ms": dns_time
-                },
-                "tcp_connection": {
-                    "host": f"{hostname}:443",
-                    "time_ms": tcp_time
-                },
-                "http_head": {
-                    "status_code": response.status_code,
-                    "time_ms": head_time
-                }
-            },
-            "diagnosis": "API endpoint is reachable from this server"
-        }), 200
-        
-    except Exception as e:
-        total_time = int((datetime.now() - start_time).total_seconds() * 1000)
-        logger.error(f"❌ [REQUEST:{request_id}] Connectivity test failed: {str(e)}")
-        
-        return jsonify({
-            "request_id": request_id,
-            "timestamp": start_time.isoformat(),
-            "status": "error",
-            "total_time_ms": total_time,
-            "error": str(e),
-            "diagnosis": "API endpoint is not reachable from this server"
-        }), 500
+    }
+    body["diagnosis"] = "API endpoint is reachable from this server"
+    return jsonify(body), 200
 
 @app.route('/api/v1/fps/fast', methods=['GET'])
 def get_fps_data_fast():
@@ -153,12 +485,34 @@ def get_fps_data_fast():
     Fast endpoint that returns sample data when the real API is slow.
     Use this when you need immediate response.
     """
-    request_id = str(uuid.uuid4())
+    request_id = g.request_id
     start_time = datetime.now()
     
-    logger.info(f"🚀 [REQUEST:{request_id}] Fast FPS endpoint called")
+    projection = projection_from_query(request.args)
+    
+    # Prefer the last real upstream payload, however old it is
+    entry = fps_cache.peek(HARDCODED_RUN_ID)
+    if entry is not None:
+        unchanged = not_modified(entry, projection)
+        if unchanged is not None:
+            return unchanged
+        execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+        return with_validators(jsonify({
+            "request_id": request_id,
+            "timestamp": start_time.isoformat(),
+            "status": "success",
+            "execution_time_ms": execution_time_ms,
+            "data_type": "cached",
+            "note": "Last payload retrieved from the FPS API. Use /api/v1/fps for fresh data (slower).",
+            "cache": cache_info(entry, "fresh" if entry.age() <= fps_cache.ttl else "stale"),
+            "hardcoded_values": {
+                "run_id": HARDCODED_RUN_ID,
+                "token_used": "✓ Not needed for cached data"
+            },
+            "fps_data": project(entry.payload, projection)
+        }), entry, projection), 200
     
-    # Sample data based on your actual API structure
+    # Cold cache - fall back to sample data based on your actual API structure
     sample_fps_data = {
         "perfruns": [{
             "request_id": HARDCODED_RUN_ID,
@@ -189,7 +543,7 @@ def get_fps_data_fast():
             "run_id": HARDCODED_RUN_ID,
             "token_used": "✓ Not needed for sample data"
         },
-        "fps_data": sample_fps_data
+        "fps_data": project(sample_fps_data, projection)
     }), 200
 
 @app.route('/api/v1/fps', methods=['GET'])
@@ -197,29 +551,50 @@ def get_fps_data():
     """
     Simple endpoint that executes the hardcoded curl command.
     No inputs required - everything is hardcoded.
+    Pass ?passthrough=1 to stream the upstream body through on a cache miss,
+    or ?fields= / ?task_name= / ?task_status= to trim the returned perfrun data.
     """
-    request_id = str(uuid.uuid4())
+    request_id = g.request_id
     start_time = datetime.now()
+    # Router budget (30s minus a safety margin, counted from X-Request-Start) for every upstream call
+    deadline = request_deadline(request.headers)
+    projection = projection_from_query(request.args)
+    # Raw bytes cannot be projected, so a projection always takes the parsed path
+    passthrough = request.args.get("passthrough", PASSTHROUGH_DEFAULT) == "1" and projection is None
     
-    logger.info(f"🚀 [REQUEST:{request_id}] FPS API call with hardcoded values")
+    # Serve from cache when possible; stale entries are refreshed in the background
+    fps_prefetch.note_request(HARDCODED_RUN_ID)
+    entry, cache_state = fps_cache.lookup(HARDCODED_RUN_ID)
+    if entry is not None:
+        if cache_state == "stale":
+            fps_cache.refresh_async(HARDCODED_RUN_ID, refresh_perfrun)
+        unchanged = not_modified(entry, projection)
+        if unchanged is not None:
+            access_log.note(cache=cache_state)
+            return unchanged
+        execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+        access_log.note(cache=cache_state)
+        return with_validators(jsonify({
+            "request_id": request_id,
+            "timestamp": start_time.isoformat(),
+            "status": "success",
+            "execution_time_ms": execution_time_ms,
+            "cache": cache_info(entry, cache_state),
+            "hardcoded_values": {
+                "run_id": HARDCODED_RUN_ID,
+                "token_used": "✓ Hardcoded token"
+            },
+            "fps_data": project(entry.payload, projection)
+        }), entry, projection), 200
     
     try:
-        # FPS API endpoint with hardcoded run ID
-        url = f"https://performance.sfproxy.core1.perf1-useast2.aws.sfdc.cl/api/v1/perfruns/{HARDCODED_RUN_ID}"
-        
-        # Headers with hardcoded token
-        headers = {
-            "accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"bearer {HARDCODED_TOKEN}"
-        }
-        
-        logger.info(f"📡 [REQUEST:{request_id}] Calling FPS API: {url}")
+        # FPS API call for the hardcoded run ID (auth headers live on the pooled session)
+        access_log.note(cache="miss", passthrough=passthrough)
         
         # Check if we're already approaching timeout limit
         elapsed_time = (datetime.now() - start_time).total_seconds()
-        if elapsed_time > 25:
-            logger.error(f"⏰ [REQUEST:{request_id}] Pre-request timeout check failed - already {elapsed_time:.1f}s elapsed")
+        if deadline.remaining() < MIN_UPSTREAM_SECONDS:
+            logger.error(f"⏰ [REQUEST:{request_id}] Pre-request timeout check failed - only {deadline.remaining():.1f}s of budget left")
             return jsonify({
                 "request_id": request_id,
                 "timestamp": start_time.isoformat(),
@@ -229,19 +604,22 @@ def get_fps_data():
                 "error_type": "pre_timeout"
             }), 504
         
-        # Make GET request with aggressive timeouts (equivalent to your curl command)
-        response = requests.get(
-            url=url,
-            headers=headers,
-            verify=False,  # Equivalent to curl -k flag
-            timeout=(5, 20)  # (connect_timeout=5s, read_timeout=20s) = max 25s total
+        # Make GET request with aggressive timeouts (equivalent to your curl command),
+        # conditional on any expired copy we still hold
+        previous = fps_cache.peek(HARDCODED_RUN_ID)
+        response = fps_client.get_perfrun(
+            HARDCODED_RUN_ID,
+            deadline=deadline,  # connect <= 5s, read <= 20s, all within the router budget
+            stream=passthrough,
+            **revalidation_headers(previous)
         )
         
         execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
         
         # Double-check we haven't exceeded time limit
-        if execution_time_ms > 28000:  # 28 seconds
+        if deadline.expired():
             logger.error(f"⏰ [REQUEST:{request_id}] Post-request timeout - took {execution_time_ms}ms")
+            response.close()
             return jsonify({
                 "request_id": request_id,
                 "timestamp": start_time.isoformat(),
@@ -252,21 +630,46 @@ def get_fps_data():
             }), 504
         
         # Log response
-        logger.info(f"📈 [REQUEST:{request_id}] FPS API responded: {response.status_code}, Time: {execution_time_ms}ms")
+        access_log.note(upstream_status=response.status_code, upstream_ms=execution_time_ms)
         
-        if response.status_code == 200:
-            logger.info(f"✅ [REQUEST:{request_id}] Success - Retrieved FPS data")
-            return jsonify({
+        if response.status_code == 304 and previous is not None:
+            response.close()
+            entry = store_perfrun(HARDCODED_RUN_ID, response, previous)
+            access_log.note(cache="revalidated")
+            unchanged = not_modified(entry, projection)
+            if unchanged is not None:
+                return unchanged
+            return with_validators(jsonify({
                 "request_id": request_id,
                 "timestamp": start_time.isoformat(),
                 "status": "success",
                 "execution_time_ms": execution_time_ms,
+                "cache": cache_info(entry, "revalidated"),
                 "hardcoded_values": {
                     "run_id": HARDCODED_RUN_ID,
                     "token_used": "✓ Hardcoded token"
                 },
-                "fps_data": response.json()
-            }), 200
+                "fps_data": project(entry.payload, projection)
+            }), entry, projection), 200
+        elif response.status_code == 200:
+            if passthrough:
+                return passthrough_response(request_id, start_time, response)
+            entry = store_perfrun(HARDCODED_RUN_ID, response, previous)
+            unchanged = not_modified(entry, projection)
+            if unchanged is not None:
+                return unchanged
+            return with_validators(jsonify({
+                "request_id": request_id,
+                "timestamp": start_time.isoformat(),
+                "status": "success",
+                "execution_time_ms": execution_time_ms,
+                "cache": cache_info(entry, "miss"),
+                "hardcoded_values": {
+                    "run_id": HARDCODED_RUN_ID,
+                    "token_used": "✓ Hardcoded token"
+                },
+                "fps_data": project(entry.payload, projection)
+            }), entry, projection), 200
         else:
             logger.error(f"❌ [REQUEST:{request_id}] FPS API error: {response.status_code}")
             return jsonify({
@@ -284,7 +687,38 @@ def get_fps_data():
                 }
             }), response.status_code
     
-    except requests.exceptions.Timeout as e:
+    except CircuitOpenError as e:
+        # FPS API is failing; serve the last-known copy (however old) or fail fast
+        execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+        previous = fps_cache.peek(HARDCODED_RUN_ID)
+        if previous is not None:
+            logger.warning(f"🔌 [REQUEST:{request_id}] Circuit open - serving last-known FPS data")
+            return with_validators(jsonify({
+                "request_id": request_id,
+                "timestamp": start_time.isoformat(),
+                "status": "success",
+                "execution_time_ms": execution_time_ms,
+                "cache": cache_info(previous, "fallback"),
+                "degraded": True,
+                "hardcoded_values": {
+                    "run_id": HARDCODED_RUN_ID,
+                    "token_used": "✓ Hardcoded token"
+                },
+                "fps_data": project(previous.payload, projection)
+            }), previous, projection), 200
+        logger.error(f"🔌 [REQUEST:{request_id}] Circuit open - failing fast")
+        return jsonify({
+            "request_id": request_id,
+            "timestamp": start_time.isoformat(),
+            "status": "error",
+            "execution_time_ms": execution_time_ms,
+            "error": str(e),
+            "error_type": "circuit_open",
+            "suggestion": "The FPS API is failing repeatedly. Try again later."
+        }), 503, {"Retry-After": str(max(int(e.retry_after + 0.5), 1))}
+
+    except (requests.exceptions.Timeout, TimeoutError) as e:
+        # TimeoutError: request deadline spent (incl. waiting on a coalesced or hedged request)
         execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
         logger.error(f"⏰ [REQUEST:{request_id}] Request timeout after {execution_time_ms}ms")
         return jsonify({
@@ -292,7 +726,7 @@ def get_fps_data():
             "timestamp": start_time.isoformat(),
             "status": "error",
             "execution_time_ms": execution_time_ms,
-            "error": "FPS API request timed out after 25 seconds",
+            "error": f"FPS API request timed out after {execution_time_ms / 1000:.1f} seconds",
             "error_type": "timeout",
             "suggestion": "The FPS API is taking longer than expected. Try again later."
         }), 504  # Gateway Timeout
@@ -320,6 +754,211 @@ def get_fps_data():
             "error": f"Internal server error: {str(e)}"
         }), 500
 
+@app.route('/api/v1/fps/jobs', methods=['GET', 'POST'])
+def create_fps_job():
+    """
+    Start a background FPS API fetch and return 202 immediately.
+    Poll the returned status_url for the result.
+    """
+    request_id = g.request_id
+    
+    try:
+        job = fps_jobs.submit(HARDCODED_RUN_ID, run_fetch_job)
+    except JobQueueFull as e:
+        logger.error(f"🚦 [REQUEST:{request_id}] Job rejected: {str(e)}")
+        response = jsonify({
+            "request_id": request_id,
+            "status": "error",
+            "error": "Too many FPS jobs in progress, retry shortly",
+            "error_type": "job_queue_full"
+        })
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    
+    status_url = url_for('get_fps_job', job_id=job.job_id)
+    access_log.note(job_id=job.job_id)
+    
+    response = jsonify({
+        "request_id": request_id,
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": status_url
+    })
+    response.headers["Location"] = status_url
+    return response, 202
+
+@app.route('/api/v1/fps/jobs/<job_id>', methods=['GET'])
+def get_fps_job(job_id):
+    """Status of a background FPS fetch, including the data once it succeeded."""
+    job = fps_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "job_id": job_id,
+            "status": "error",
+            "error": "Unknown or expired job"
+        }), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/v1/perfruns:batch', methods=['POST'])
+def get_perfruns_batch():
+    """
+    Fetch several perfruns in parallel under one deadline.
+    Body: {"run_ids": [...], "deadline_seconds": optional}.
+    Add ?stream=1 (or Accept: application/x-ndjson) to get one JSON line per run as it completes,
+    and ?fields= / ?task_name= / ?task_status= to trim each run's data.
+    """
+    request_id = g.request_id
+    start_time = datetime.now()
+    
+    run_ids, deadline, error = parse_run_batch(request.get_json(silent=True))
+    if error is not None:
+        return jsonify({
+            "request_id": request_id,
+            "status": "error",
+            "error": error
+        }), 400
+    
+    access_log.note(runs=len(run_ids), deadline_seconds=deadline)
+    projection = projection_from_query(request.args)
+    if projection is None:
+        fetch = fetch_batch_run
+    else:
+        def fetch(run_id, remaining):
+            return projection.apply(fetch_batch_run(run_id, remaining))
+    
+    results = fps_batch.run(run_ids, fetch, deadline=deadline)
+    
+    if request.args.get("stream") == "1" or request.accept_mimetypes.best == "application/x-ndjson":
+        def generate():
+            for result in results:
+                yield json.dumps(result) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson",
+                        headers={"X-Request-ID": request_id})
+    
+    results = list(results)
+    errors = sum(1 for result in results if result["status"] == "error")
+    execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+    access_log.note(failed_runs=errors)
+    
+    return jsonify({
+        "request_id": request_id,
+        "timestamp": start_time.isoformat(),
+        "status": "success" if not errors else "partial" if errors < len(results) else "error",
+        "execution_time_ms": execution_time_ms,
+        "total_count": len(results),
+        "error_count": errors,
+        "results": results
+    }), 200
+
+@app.route('/api/v1/perfruns:analytics', methods=['POST'])
+def get_perfruns_analytics():
+    """
+    Aggregates across several perfruns, computed over parsed duration columns.
+    Body: {"run_ids": [...], "baseline": optional run ID, "percentiles": optional list,
+    "deadline_seconds": optional}. Returns per-task percentiles, regressions against the
+    baseline and the pass-rate trend (in run_ids order).
+    """
+    request_id = g.request_id
+    start_time = datetime.now()
+    
+    body = request.get_json(silent=True)
+    run_ids, deadline, error = parse_run_batch(body, baseline=True)
+    if error is None:
+        baseline = body.get("baseline")
+        from analytics import DEFAULT_PERCENTILES  # loaded on first use, see analytics_store()
+        percentiles = body.get("percentiles") or list(DEFAULT_PERCENTILES)
+        if not isinstance(percentiles, list) or not all(
+                isinstance(pct, (int, float)) and not isinstance(pct, bool) and 0 < pct <= 100
+                for pct in percentiles):
+            error = "'percentiles' must be a list of numbers in (0, 100]"
+    if error is not None:
+        return jsonify({
+            "request_id": request_id,
+            "status": "error",
+            "error": error
+        }), 400
+    
+    access_log.note(runs=len(run_ids), deadline_seconds=deadline)
+    results = {result["run_id"]: result for result in fps_batch.run(run_ids, fetch_analytics_run, deadline=deadline)}
+    loaded = [run_id for run_id in run_ids if results[run_id]["status"] == "success"]
+    with metrics.timer("analytics"):
+        report = analytics_store().analyze(loaded, baseline=baseline, percentiles=percentiles)
+    errors = len(run_ids) - len(loaded)
+    access_log.note(failed_runs=errors)
+    
+    for result in results.values():
+        # Per-run summaries instead of whole payloads
+        if result["status"] == "success":
+            result["summary"] = result.pop("fps_data")
+    execution_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+    
+    return jsonify({
+        "request_id": request_id,
+        "timestamp": start_time.isoformat(),
+        "status": "success" if not errors else "partial" if loaded else "error",
+        "execution_time_ms": execution_time_ms,
+        "total_count": len(run_ids),
+        "error_count": errors,
+        "runs": [results[run_id] for run_id in run_ids],
+        "analytics": report
+    }), 200
+
+@app.route('/api/v1/perfruns/<run_id>/events', methods=['GET'])
+def stream_perfrun_events(run_id):
+    """
+    Server-sent events for one perfrun: a snapshot, then only changes to status,
+    result_status and perfrun_tasks entries. All subscribers of a run ID share
+    one upstream poller.
+    """
+    if not is_valid_run_id(run_id):
+        return jsonify({
+            "status": "error",
+            "error": "Invalid run ID (letters, digits and dashes only)"
+        }), 400
+    fps_prefetch.note_request(run_id)
+    watcher, subscription = fps_events.subscribe(run_id)
+    access_log.note(run_id=run_id, subscribers=watcher.stats()["subscribers"])
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            yield from subscription.frames()
+        finally:
+            watcher.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/v1/stats', methods=['GET'])
+def get_stats():
+    """In-process stats for this worker (connection reuse etc.)."""
+    return jsonify({
+        "pid": os.getpid(),
+        "timestamp": datetime.now().isoformat(),
+        "upstream": {
+            "base_url": fps_client.base_url,
+            "pool": fps_client.pool.stats(),
+            "connections": fps_client.stats.snapshot(),
+            "singleflight": fps_client.flights.stats(),
+            "dns": fps_client.dns.stats(),
+            "hedging": fps_client.hedger.stats(),
+            "circuit": fps_client.breaker.snapshot()
+        },
+        "cache": fps_cache.stats(),
+        "jobs": fps_jobs.stats(),
+        "events": fps_events.stats(),
+        "analytics": _analytics_store.stats() if _analytics_store is not None else None,
+        "compression": fps_compressor.stats(),
+        "admission": fps_admission.stats(),
+        "prefetch": fps_prefetch.stats(),
+        "logging": logpipeline.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: per-phase latency histograms merged across workers."""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
@@ -330,6 +969,8 @@ def method_not_allowed(error):
     """Handle 405 errors."""
     return jsonify({"error": "Method not allowed"}), 405
 
+fps_prefetch.start()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
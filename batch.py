@@ -0,0 +1,96 @@
+"""
+Bounded parallel fan-out for multi-run lookups.
+
+All runs of a batch share one thread pool and one overall deadline; results
+are yielded as they complete so callers can stream them.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import requests
+
+from breaker import CircuitOpenError
+from upstream import FPSAPIError
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.environ.get('FPS_BATCH_WORKERS', 8))
+BATCH_MAX_RUNS = int(os.environ.get('FPS_BATCH_MAX_RUNS', 50))
+BATCH_DEADLINE_SECONDS = float(os.environ.get('FPS_BATCH_DEADLINE', 25))
+
+
+def run_result(run_id, started, payload=None, error=None):
+    """Per-run entry of a batch response."""
+    result = {
+        "run_id": run_id,
+        "execution_time_ms": int((time.monotonic() - started) * 1000),
+    }
+    if error is None:
+        result["status"] = "success"
+        result["fps_data"] = payload
+        return result
+
+    result["status"] = "error"
+    if isinstance(error, FPSAPIError):
+        result["error_type"] = "fps_error"
+        result["fps_error"] = {"status_code": error.status_code, "message": error.message}
+    elif isinstance(error, CircuitOpenError):
+        result["error_type"] = "circuit_open"
+        result["error"] = str(error)
+    elif isinstance(error, (requests.exceptions.Timeout, TimeoutError)):
+        result["error_type"] = "timeout"
+        result["error"] = str(error) or "Timed out"
+    elif isinstance(error, requests.exceptions.RequestException):
+        result["error_type"] = "request_error"
+        result["error"] = f"Request failed: {str(error)}"
+    else:
+        result["error_type"] = "internal"
+        result["error"] = str(error)
+    return result
+
+
+class BatchFetcher:
+    """Runs fetch(run_id, read_timeout) for many run IDs on a bounded pool."""
+
+    def __init__(self, workers=BATCH_WORKERS, max_runs=BATCH_MAX_RUNS,
+                 deadline=BATCH_DEADLINE_SECONDS):
+        self.max_runs = max_runs
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fps-batch")
+
+    def run(self, run_ids, fetch, deadline=None):
+        """
+        Yield one result dict per run ID, in completion order. Runs still
+        pending when the deadline passes are cancelled and reported as timeouts.
+        """
+        deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        started = time.monotonic()
+        expires_at = started + deadline
+
+        futures = {}
+        for run_id in run_ids:
+            futures[self._executor.submit(self._call, fetch, run_id, expires_at)] = run_id
+
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                run_id = futures.pop(future)
+                try:
+                    yield run_result(run_id, started, payload=future.result())
+                except Exception as e:
+                    yield run_result(run_id, started, error=e)
+        except FuturesTimeoutError:
+            logger.error(f"⏰ Batch deadline of {deadline}s hit with {len(futures)} runs pending")
+            for future, run_id in futures.items():
+                future.cancel()
+                yield run_result(run_id, started, error=TimeoutError(f"Batch deadline of {deadline}s exceeded"))
+
+    @staticmethod
+    def _call(fetch, run_id, expires_at):
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Batch deadline exceeded before the fetch started")
+        return fetch(run_id, remaining)
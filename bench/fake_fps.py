@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the FPS perfruns API, for benchmarks and offline testing.
+
+Serves GET/HEAD /api/v1/perfruns/<run_id> with a synthetic perfrun document.
+Latency distribution, error rate and payload size are configurable.
+If-None-Match is honoured so conditional revalidation can be exercised, and
+--compress answers with gzip (or br) bodies when the client accepts them.
+
+    python bench/fake_fps.py --port 8700 --latency lognormal:80,0.6 --error-rate 0.02 --tasks 200
+
+Point the service at it with FPS_BASE_URL=http://127.0.0.1:8700.
+"""
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli
+except ImportError:  # optional: --compress then only offers gzip
+    brotli = None
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec (all values in ms) into a sampler returning seconds:
+
+    fixed:MS                   every response takes MS
+    uniform:LOW,HIGH           uniformly between LOW and HIGH
+    lognormal:MEDIAN,SIGMA     log-normal with the given median and shape
+    bimodal:FAST,SLOW,RATIO    FAST, except a RATIO share of responses take SLOW
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",")] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000.0
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000.0
+    if kind == "bimodal" and len(values) == 3:
+        return lambda: (values[1] if random.random() < values[2] else values[0]) / 1000.0
+    raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+
+
+def perfrun_document(run_id, tasks, status, result_status):
+    """A perfrun document shaped like the FPS API's, with `tasks` task entries."""
+    return {
+        "perfruns": [{
+            "request_id": run_id,
+            "status": status,
+            "result_status": result_status,
+            "perfrun_duration": "43m48s",
+            "perfrun_tasks": [
+                {
+                    "name": f"Task {index:04d}",
+                    "status": "FINISHED",
+                    "duration": f"{index % 50}m{index % 60:02d}s",
+                }
+                for index in range(tasks)
+            ],
+        }],
+        "total_count": 1,
+    }
+
+
+class FakeFPSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by build_server()
+
+    def log_message(self, *args):
+        pass
+
+    def _run_id(self):
+        prefix = "/api/v1/perfruns/"
+        if not self.path.startswith(prefix):
+            return None
+        return self.path[len(prefix):].split("?", 1)[0] or None
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self):
+        config = self.config
+        config.count()
+        run_id = self._run_id()
+        if run_id is None:
+            return self._send(404, b'{"error": "not found"}', {"Content-Type": "application/json"})
+        time.sleep(config.latency())
+        if random.random() < config.error_rate:
+            return self._send(config.error_status, b'{"error": "injected failure"}',
+                              {"Content-Type": "application/json"})
+        body, etag = config.body(run_id)
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag})
+        headers = {"Content-Type": "application/json", "ETag": etag, "Vary": "Accept-Encoding"}
+        encoding = config.encoding_for(self.headers.get("Accept-Encoding", ""))
+        if encoding is not None:
+            body = config.encoded_body(run_id, encoding)
+            headers["Content-Encoding"] = encoding
+        self._send(200, body, headers)
+
+    do_GET = _handle
+    do_HEAD = _handle
+
+
+class FakeFPSConfig:
+    """Shared settings plus the rendered body per run ID."""
+
+    def __init__(self, latency, error_rate, error_status, tasks, status, result_status, compress=False):
+        self.latency = latency
+        self.compress = compress
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.tasks = tasks
+        self.status = status
+        self.result_status = result_status
+        self.requests = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def body(self, run_id):
+        with self._lock:
+            cached = self._bodies.get(run_id)
+        if cached is None:
+            document = perfrun_document(run_id, self.tasks, self.status, self.result_status)
+            body = json.dumps(document).encode()
+            cached = (body, f'"{run_id[:8]}-{len(body)}"')
+            with self._lock:
+                self._bodies[run_id] = cached
+        return cached
+
+    def encoding_for(self, accept_encoding):
+        if not self.compress:
+            return None
+        offered = {value.split(";")[0].strip() for value in accept_encoding.split(",")}
+        if brotli is not None and "br" in offered:
+            return "br"
+        return "gzip" if "gzip" in offered else None
+
+    def encoded_body(self, run_id, encoding):
+        key = (run_id, encoding)
+        with self._lock:
+            cached = self._bodies.get(key)
+        if cached is None:
+            body = self.body(run_id)[0]
+            cached = brotli.compress(body) if encoding == "br" else gzip.compress(body)
+            with self._lock:
+                self._bodies[key] = cached
+        return cached
+
+
+def build_server(host, port, config):
+    handler = type("Handler", (FakeFPSHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the FPS perfruns API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=parse_latency, default=parse_latency("fixed:50"),
+                        help="fixed:MS | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA | bimodal:FAST,SLOW,RATIO")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--tasks", type=int, default=20, help="perfrun_tasks entries (payload size)")
+    parser.add_argument("--status", default="FINISHED")
+    parser.add_argument("--result-status", default="PASSED")
+    parser.add_argument("--compress", action="store_true", help="gzip/br bodies per Accept-Encoding")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = FakeFPSConfig(args.latency, args.error_rate, args.error_status, args.tasks,
+                           args.status, args.result_status, args.compress)
+    server = build_server(args.host, args.port, config)
+    sample_size = len(config.body("sample")[0])
+    print(f"🧪 Fake FPS API on http://{args.host}:{args.port} ({sample_size} byte payloads, "
+          f"error rate {args.error_rate:.1%})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"🧪 Served {config.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
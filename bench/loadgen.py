@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load generator for the FPS API Client.
+
+Keeps --concurrency requests in flight against the chosen endpoints for
+--duration seconds, then reports throughput, error counts and latency
+percentiles per endpoint.
+
+    python bench/loadgen.py --target http://127.0.0.1:5000 --endpoints fps,fast --concurrency 50 --duration 30
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import percentile  # noqa: E402 - the service's helper, from the repo root
+
+ENDPOINTS = {
+    "fps": "/api/v1/fps",
+    "fast": "/api/v1/fps/fast",
+    "connectivity": "/api/v1/connectivity",
+    "health": "/",
+    "test": "/api/v1/test",
+}
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Recorder:
+    """Per-endpoint latencies and outcomes collected from all client threads."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, status=None, error=None):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if error is not None:
+                self.errors.setdefault(name, {}).setdefault(error, 0)
+                self.errors[name][error] += 1
+            else:
+                counts = self.statuses.setdefault(name, {})
+                counts[status] = counts.get(status, 0) + 1
+
+    def report(self, elapsed):
+        summary = {}
+        with self._lock:
+            for name, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                statuses = self.statuses.get(name, {})
+                failed = sum(count for status, count in statuses.items() if status >= 400)
+                failed += sum(self.errors.get(name, {}).values())
+                summary[name] = {
+                    "requests": len(values),
+                    "rps": round(len(values) / elapsed, 1),
+                    "failed": failed,
+                    "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                    "errors": dict(self.errors.get(name, {})),
+                    "latency_ms": dict(
+                        {f"p{pct}": round(percentile(values, pct) * 1000, 1) for pct in PERCENTILES},
+                        mean=round(sum(values) / len(values) * 1000, 1),
+                        max=round(values[-1] * 1000, 1),
+                    ),
+                }
+        return summary
+
+
+def client_loop(target, paths, stop_at, recorder, timeout, record_after):
+    """One simulated client: a keep-alive session issuing requests back to back."""
+    session = requests.Session()
+    for name, path in paths:
+        if time.monotonic() >= stop_at:
+            break
+        start = time.monotonic()
+        try:
+            response = session.get(target + path, timeout=timeout)
+            response.content
+            status, error = response.status_code, None
+        except requests.exceptions.RequestException as e:
+            status, error = None, type(e).__name__
+        if start >= record_after:
+            recorder.record(name, time.monotonic() - start, status, error)
+    session.close()
+
+
+def run(target, endpoints, concurrency, duration, warmup=0.0, timeout=30):
+    """Drive the endpoints for warmup + duration seconds; returns the report dict."""
+    recorder = Recorder()
+    started = time.monotonic()
+    record_after = started + warmup
+    stop_at = record_after + duration
+    threads = []
+    for index in range(concurrency):
+        # Stagger the starting endpoint so every endpoint sees load from the first second
+        rotation = endpoints[index % len(endpoints):] + endpoints[:index % len(endpoints)]
+        paths = itertools.cycle([(name, ENDPOINTS.get(name, name)) for name in rotation])
+        thread = threading.Thread(target=client_loop, name=f"loadgen-{index}", daemon=True,
+                                  args=(target.rstrip("/"), paths, stop_at, recorder, timeout, record_after))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - record_after
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def print_report(report):
+    print(f"\n📊 {report['target']}  concurrency={report['concurrency']}  "
+          f"duration={report['duration_seconds']}s")
+    header = f"{'endpoint':<14}{'reqs':>8}{'rps':>9}{'failed':>8}" + "".join(
+        f"{f'p{pct}':>9}" for pct in PERCENTILES) + f"{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{name:<14}{stats['requests']:>8}{stats['rps']:>9}{stats['failed']:>8}" + "".join(
+            f"{latency[f'p{pct}']:>9}" for pct in PERCENTILES) + f"{latency['max']:>9}")
+    print("(latencies in ms)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the FPS API Client")
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoints", default="fps,fast,connectivity",
+                        help=f"comma separated names ({', '.join(ENDPOINTS)}) or raw paths")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before that")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    report = run(args.target, endpoints, args.concurrency, args.duration, args.warmup, args.timeout)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+One-shot benchmark: fake FPS API + the service under gunicorn + load generator.
+
+Starts bench/fake_fps.py and gunicorn (pointed at the fake via FPS_BASE_URL,
+with a scratch cache/metrics directory so runs do not share state), drives
+load with bench/loadgen.py, prints the report and shuts everything down.
+
+    python bench/run.py --latency lognormal:80,0.6 --error-rate 0.01 --concurrency 100 --duration 20
+
+Extra service settings can be passed as environment variables, e.g.
+FPS_CACHE_TTL=0 python bench/run.py ... to measure the uncached path.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+import loadgen
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, "bench")
+
+
+def wait_until_up(url, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def stop(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FPS API Client against a local fake upstream")
+    parser.add_argument("--app-port", type=int, default=8701)
+    parser.add_argument("--fake-port", type=int, default=8700)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (WEB_CONCURRENCY)")
+    parser.add_argument("--worker-class", default="gevent")
+    parser.add_argument("--latency", default="fixed:50", help="fake FPS latency spec (see fake_fps.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tasks", type=int, default=20, help="perfrun_tasks per payload")
+    parser.add_argument("--compress", action="store_true", help="fake FPS API sends gzip/br bodies")
+    parser.add_argument("--endpoints", default="fps,fast,connectivity")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scratch = tempfile.mkdtemp(prefix="fps-bench-")
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_fps.py"), "--port", str(args.fake_port),
+         "--latency", args.latency, "--error-rate", str(args.error_rate), "--tasks", str(args.tasks)]
+        + (["--compress"] if args.compress else []),
+        stdout=open(os.path.join(scratch, "fake_fps.log"), "w"), stderr=subprocess.STDOUT)
+    env = dict(
+        os.environ,
+        PORT=str(args.app_port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_WORKER_CLASS=args.worker_class,
+        FPS_BASE_URL=f"http://127.0.0.1:{args.fake_port}",
+        FPS_CACHE_DB=os.path.join(scratch, "perfruns.sqlite3"),
+        FPS_METRICS_DIR=os.path.join(scratch, "metrics"),
+    )
+    app = subprocess.Popen(["gunicorn", "app:app", "--config", "gunicorn.conf.py"], cwd=REPO_ROOT, env=env,
+                           stdout=open(os.path.join(scratch, "gunicorn.log"), "w"), stderr=subprocess.STDOUT)
+    target = f"http://127.0.0.1:{args.app_port}"
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.fake_port}/api/v1/perfruns/ready")
+        wait_until_up(target + "/")
+        endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+        report = loadgen.run(target, endpoints, args.concurrency, args.duration, args.warmup)
+        report["upstream"] = {"latency": args.latency, "error_rate": args.error_rate, "tasks": args.tasks}
+        report["workers"] = f"{args.workers} x {args.worker_class}"
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            loadgen.print_report(report)
+            print(f"upstream: {args.latency}, error rate {args.error_rate:.1%}, {args.tasks} tasks; "
+                  f"workers: {report['workers']}")
+    finally:
+        stop(app)
+        stop(fake)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
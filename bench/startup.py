@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Startup-time and per-request-cost baseline for the cheap routes.
+
+Measures how long `import app` takes in a fresh interpreter (what a cold
+dyno or a recycled worker pays before serving), then drives the health,
+test and fast routes in-process through Flask's test client for a fixed
+time each. No sockets are involved, so the requests/second are the cost of
+the Python request path alone.
+
+    python bench/startup.py --imports 10 --duration 3
+    python bench/startup.py --json > before.json
+
+Background work that would touch the network (connectivity prober, prefetch)
+is switched off and the cache/metrics directories point at a scratch dir.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = {"health": "/", "test": "/api/v1/test", "fast": "/api/v1/fps/fast"}
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+
+
+def isolated_env(scratch):
+    env = dict(os.environ)
+    env.update({
+        "FPS_PROBE_INTERVAL": "0",
+        "FPS_PREFETCH": "0",
+        "FPS_CACHE_DB": os.path.join(scratch, "cache.sqlite3"),
+        "FPS_METRICS_DIR": os.path.join(scratch, "metrics"),
+        "FPS_LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def measure_imports(runs, env):
+    """Seconds to `import app` in each of `runs` fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=REPO_ROOT, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return times
+
+
+def measure_routes(routes, duration):
+    """Requests/second per route through the Flask test client (single thread, in-process)."""
+    sys.path.insert(0, REPO_ROOT)
+    import app  # noqa: E402 - imported after the environment is set up
+
+    client = app.app.test_client()
+    results = {}
+    for name, path in routes.items():
+        for _ in range(50):  # warm-up
+            client.get(path).close()
+        count = 0
+        start = time.perf_counter()
+        deadline = start + duration
+        while time.perf_counter() < deadline:
+            response = client.get(path)
+            response.close()  # as a WSGI server would; runs the call_on_close hooks
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+            count += 1
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "path": path,
+            "requests": count,
+            "rps": round(count / elapsed, 1),
+            "mean_us": round(elapsed / count * 1e6, 1),
+        }
+    return results
+
+
+def print_report(report):
+    imports = report["import_seconds"]
+    print(f"\n🚀 import app: median {imports['median'] * 1000:.1f}ms  "
+          f"min {imports['min'] * 1000:.1f}ms  max {imports['max'] * 1000:.1f}ms  ({imports['runs']} runs)")
+    header = f"{'route':<10}{'path':<20}{'requests':>10}{'rps':>10}{'mean µs':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["routes"].items():
+        print(f"{name:<10}{stats['path']:<20}{stats['requests']:>10}{stats['rps']:>10}{stats['mean_us']:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time and cheap-route throughput baseline")
+    parser.add_argument("--imports", type=int, default=10, help="fresh-interpreter imports to time")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--routes", default=",".join(ROUTES), help=f"comma separated subset of {', '.join(ROUTES)}")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    routes = {name: ROUTES[name] for name in args.routes.split(",") if name in ROUTES}
+    with tempfile.TemporaryDirectory(prefix="fps-startup-") as scratch:
+        env = isolated_env(scratch)
+        imports = measure_imports(args.imports, env)
+        os.environ.update(env)
+        report = {
+            "python": sys.version.split()[0],
+            "import_seconds": {
+                "runs": len(imports),
+                "min": round(min(imports), 4),
+                "median": round(statistics.median(imports), 4),
+                "max": round(max(imports), 4),
+            },
+            "routes": measure_routes(routes, args.duration),
+        }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Circuit breaker for the FPS API.
+
+closed    - calls flow; outcomes go into a rolling window. When enough of the
+            window are errors or timeouts the breaker opens.
+open      - calls fail immediately with CircuitOpenError until the cool-down
+            has passed.
+half_open - a limited number of trial calls go through; a success closes the
+            breaker again, a failure re-opens it.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+BREAKER_WINDOW = int(os.environ.get('FPS_BREAKER_WINDOW', 20))
+BREAKER_MIN_CALLS = int(os.environ.get('FPS_BREAKER_MIN_CALLS', 5))
+BREAKER_FAILURE_RATIO = float(os.environ.get('FPS_BREAKER_FAILURE_RATIO', 0.5))
+BREAKER_OPEN_SECONDS = float(os.environ.get('FPS_BREAKER_OPEN_SECONDS', 30))
+BREAKER_HALF_OPEN_CALLS = int(os.environ.get('FPS_BREAKER_HALF_OPEN_CALLS', 1))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the FPS API while the breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"FPS API circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Error/timeout-rate driven breaker with closed, open and half-open states."""
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_ratio=BREAKER_FAILURE_RATIO, open_seconds=BREAKER_OPEN_SECONDS,
+                 half_open_calls=BREAKER_HALF_OPEN_CALLS):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = CLOSED
+        self._opened_at = None
+        self._trials = 0
+        self._lock = threading.Lock()
+        self._counters = {"opened": 0, "rejected": 0, "failures": 0, "successes": 0}
+
+    def _transition(self, state):
+        # Caller holds self._lock
+        if state == self._state:
+            return
+        log = logger.error if state == OPEN else logger.info
+        log(f"🔌 FPS API circuit {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._counters["opened"] += 1
+        elif state == HALF_OPEN:
+            self._trials = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self._opened_at = None
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go to the FPS API now."""
+        with self._lock:
+            if self._state == OPEN:
+                waited = time.monotonic() - self._opened_at
+                if waited < self.open_seconds:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(self.open_seconds - waited)
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self._counters["rejected"] += 1
+                    raise CircuitOpenError(1)
+                self._trials += 1
+
+    def record_success(self):
+        with self._lock:
+            self._counters["successes"] += 1
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+            else:
+                self._outcomes.append(False)
+
+    def record_failure(self):
+        with self._lock:
+            self._counters["failures"] += 1
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._outcomes.append(True)
+            calls = len(self._outcomes)
+            if (self._state == CLOSED and calls >= self.min_calls
+                    and sum(self._outcomes) / calls >= self.failure_ratio):
+                self._transition(OPEN)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN  # the next call will be let through as a trial
+            return self._state
+
+    def snapshot(self):
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(self._outcomes)
+            retry_after = None
+            if state == OPEN:
+                retry_after = round(self.open_seconds - (time.monotonic() - self._opened_at), 1)
+            return dict(
+                self._counters,
+                state=state,
+                window_calls=calls,
+                window_failure_ratio=round(failures / calls, 3) if calls else 0.0,
+                retry_after_seconds=retry_after,
+            )
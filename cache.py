@@ -0,0 +1,241 @@
+"""
+Response cache for FPS perfrun payloads.
+
+Entries are keyed by run ID, expire after a TTL, and the cache is bounded with
+LRU eviction. Stale entries can still be served while a background refresh
+fetches a new copy (stale-while-revalidate).
+
+The in-process entries sit in front of a SQLite store shared by all workers on
+the dyno (see sharedstore.py): writes go through to it, and a worker that has
+no fresh copy of its own checks it before going upstream.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.http import parse_date
+
+from sharedstore import SharedStore
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = float(os.environ.get('FPS_CACHE_TTL', 60))
+CACHE_MAX_STALE_SECONDS = float(os.environ.get('FPS_CACHE_MAX_STALE', 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get('FPS_CACHE_MAX_ENTRIES', 128))
+# Empty disables the shared store (in-process cache only)
+CACHE_DB_PATH = os.environ.get('FPS_CACHE_DB', '/tmp/fps-cache/perfruns.sqlite3')
+CACHE_DB_MAX_ENTRIES = int(os.environ.get('FPS_CACHE_DB_MAX_ENTRIES', 1024))
+CACHE_DB_MAX_BYTES = int(os.environ.get('FPS_CACHE_DB_MAX_BYTES', 64 * 1024 * 1024))
+REFRESH_LEASE_SECONDS = float(os.environ.get('FPS_CACHE_REFRESH_LEASE', 30))
+
+
+def payload_etag(payload):
+    """Content hash used as ETag when the FPS API does not send one."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha1(body).hexdigest()
+
+
+class CacheEntry:
+    """
+    A cached upstream payload plus the time it was fetched and its validators.
+
+    upstream_etag / upstream_last_modified are the raw FPS API headers, sent back
+    upstream on revalidation. etag / modified_at are what clients see: the
+    upstream ETag when there is one, else a content hash, and the time the
+    content last changed.
+    """
+
+    __slots__ = ("payload", "fetched_at", "upstream_etag", "upstream_last_modified",
+                 "etag", "modified_at")
+
+    def __init__(self, payload, fetched_at=None, upstream_etag=None, upstream_last_modified=None,
+                 etag=None, modified_at=None):
+        self.payload = payload
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.upstream_etag = upstream_etag
+        self.upstream_last_modified = upstream_last_modified
+        self.etag = etag
+        self.modified_at = self.fetched_at if modified_at is None else modified_at
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.fetched_at
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache with stale-while-revalidate support."""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_stale=CACHE_MAX_STALE_SECONDS,
+                 max_entries=CACHE_MAX_ENTRIES, db_path=CACHE_DB_PATH):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.shared = SharedStore(db_path, CACHE_DB_MAX_ENTRIES, CACHE_DB_MAX_BYTES) if db_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0,
+                          "refreshes": 0, "revalidated": 0, "shared_hits": 0}
+
+    def _store_locally(self, key, entry):
+        # Caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _from_shared(self, key, current):
+        """Adopt the shared store's copy of key if it is newer than current."""
+        if self.shared is None:
+            return current
+        found = self.shared.get(key)
+        if found is None:
+            return current
+        payload, fields = found
+        if current is not None and fields["fetched_at"] <= current.fetched_at:
+            return current
+        entry = CacheEntry(payload, **fields)
+        with self._lock:
+            self._store_locally(key, entry)
+            self._counters["shared_hits"] += 1
+        return entry
+
+    def lookup(self, key):
+        """
+        Return (entry, state) where state is "fresh", "stale" or "miss".
+        Entries older than ttl + max_stale are treated as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.age() > self.ttl:
+            # Another worker may have fetched or revalidated it since
+            entry = self._from_shared(key, entry)
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None, "miss"
+            age = entry.age()
+            if age > self.ttl + self.max_stale:
+                self._counters["misses"] += 1
+                return None, "miss"
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            if age <= self.ttl:
+                self._counters["hits"] += 1
+                return entry, "fresh"
+            self._counters["stale_hits"] += 1
+            return entry, "stale"
+
+    def peek(self, key):
+        """Return the last known entry regardless of age, without touching LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._from_shared(key, None)
+        return entry
+
+    def set(self, key, payload, upstream_etag=None, upstream_last_modified=None):
+        """Store a freshly fetched payload along with the FPS API's validators."""
+        if upstream_etag:
+            etag = upstream_etag.removeprefix('W/').strip('"')
+        else:
+            etag = payload_etag(payload)
+        entry = CacheEntry(payload, upstream_etag=upstream_etag,
+                           upstream_last_modified=upstream_last_modified, etag=etag)
+        upstream_modified = parse_date(upstream_last_modified) if upstream_last_modified else None
+        with self._lock:
+            previous = self._entries.get(key)
+            if upstream_modified is not None:
+                entry.modified_at = upstream_modified.timestamp()
+            elif previous is not None and previous.etag == etag:
+                entry.modified_at = previous.modified_at
+            self._store_locally(key, entry)
+        if self.shared is not None:
+            self.shared.put(key, payload, fetched_at=entry.fetched_at, upstream_etag=upstream_etag,
+                            upstream_last_modified=upstream_last_modified, etag=etag,
+                            modified_at=entry.modified_at)
+        return entry
+
+    def touch(self, key):
+        """Mark an entry as just revalidated (upstream answered 304 Not Modified)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.fetched_at = time.time()
+            self._entries.move_to_end(key)
+            self._counters["revalidated"] += 1
+        if self.shared is not None:
+            self.shared.touch(key, entry.fetched_at)
+        return entry
+
+    def refresh_async(self, key, fetch):
+        """
+        Run fetch(key) on a background thread unless a refresh for key is already
+        running, in this worker or (per the shared store's lease) another one.
+        fetch may store the result itself (and return None) or return the new
+        payload to store.
+        """
+        if not self.claim_refresh(key):
+            return False
+
+        def _run():
+            try:
+                payload = fetch(key)
+                if payload is not None:
+                    self.set(key, payload)
+            except Exception as e:
+                logger.error(f"♻️ Background refresh for {key} failed: {str(e)}")
+            finally:
+                self.release_refresh(key)
+
+        threading.Thread(target=_run, name=f"cache-refresh-{key}", daemon=True).start()
+        return True
+
+    def claim_refresh(self, key):
+        """
+        Mark key as being refreshed. False when a refresh is already running in
+        this worker or, per the shared store's lease, in another one.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        if self.shared is not None and not self.shared.claim_refresh(key, REFRESH_LEASE_SECONDS):
+            with self._lock:
+                self._refreshing.discard(key)
+            return False
+        with self._lock:
+            self._counters["refreshes"] += 1
+        return True
+
+    def release_refresh(self, key):
+        if self.shared is not None:
+            self.shared.release_refresh(key)
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def recent_keys(self, limit):
+        """Most recently used keys, this worker's first, then the shared store's."""
+        with self._lock:
+            keys = list(reversed(self._entries))[:limit]
+        if self.shared is not None and len(keys) < limit:
+            keys += [key for key in self.shared.recent_keys(limit) if key not in keys]
+        return keys[:limit]
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl,
+                max_stale_seconds=self.max_stale,
+                refreshing=len(self._refreshing),
+                shared=self.shared.stats() if self.shared is not None else None,
+            )
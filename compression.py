@@ -0,0 +1,141 @@
+"""
+Accept-Encoding driven response compression (brotli or gzip).
+
+Buffered responses are compressed in one go once they reach a size threshold.
+Streamed responses (passthrough, NDJSON batches) are compressed chunk by
+chunk and flushed after each chunk, so clients still receive data as it is
+produced.
+"""
+
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('FPS_COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('FPS_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('FPS_BROTLI_QUALITY', 4))
+
+# Preference order when the client accepts several with equal quality
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SKIP_STATUS = (204, 206, 304)
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+STREAMS = {"gzip": _GzipStream, "br": _BrotliStream}
+
+
+def choose_encoding(accept_encodings):
+    """Best supported coding from a werkzeug Accept-Encoding header, or None for identity."""
+    best = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class ResponseCompressor:
+    """Compresses Flask responses in place; counts bytes before and after."""
+
+    def __init__(self, min_bytes=COMPRESS_MIN_BYTES):
+        self.min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self._counters = {"compressed": 0, "streamed": 0, "skipped_small": 0,
+                          "bytes_in": 0, "bytes_out": 0}
+
+    def _count(self, bytes_in, bytes_out, streamed=False):
+        with self._lock:
+            self._counters["streamed" if streamed else "compressed"] += 1
+            self._counters["bytes_in"] += bytes_in
+            self._counters["bytes_out"] += bytes_out
+
+    def apply(self, request, response):
+        """after_request hook body: compress response for request if worthwhile."""
+        response.vary.add("Accept-Encoding")
+        if (response.status_code < 200 or response.status_code in SKIP_STATUS
+                or "Content-Encoding" in response.headers or request.method == "HEAD"):
+            return response
+        length = None if response.is_streamed else response.content_length
+        # Checked before parsing Accept-Encoding, which costs more than most small bodies save
+        if length is not None and length < self.min_bytes:
+            with self._lock:
+                self._counters["skipped_small"] += 1
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_bytes:
+                with self._lock:
+                    self._counters["skipped_small"] += 1
+                return response
+            stream = STREAMS[encoding]()
+            compressed = stream.compress(body) + stream.finish()
+            response.set_data(compressed)
+            self._count(len(body), len(compressed))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def _stream(self, chunks, encoding):
+        stream = STREAMS[encoding]()
+        bytes_in = bytes_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if not chunk:
+                    continue
+                bytes_in += len(chunk)
+                out = stream.compress(chunk)
+                bytes_out += len(out)
+                yield out
+            out = stream.finish()
+            bytes_out += len(out)
+            yield out
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._count(bytes_in, bytes_out, streamed=True)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        ratio = counters["bytes_out"] / counters["bytes_in"] if counters["bytes_in"] else None
+        return dict(
+            counters,
+            encodings=list(ENCODINGS),
+            min_bytes=self.min_bytes,
+            ratio=round(ratio, 3) if ratio is not None else None,
+        )
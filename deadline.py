@@ -0,0 +1,73 @@
+"""
+Per-request deadline budgets.
+
+Heroku's router gives up on a request after 30 seconds. A Deadline turns
+what is left of that budget into the (connect, read) timeouts of each
+upstream call, so no call can outlive the request that made it.
+"""
+
+import os
+import time
+
+ROUTER_LIMIT_SECONDS = float(os.environ.get('ROUTER_LIMIT_SECONDS', 30))
+DEADLINE_SAFETY_SECONDS = float(os.environ.get('FPS_DEADLINE_SAFETY', 2))
+MIN_UPSTREAM_SECONDS = float(os.environ.get('FPS_MIN_UPSTREAM_BUDGET', 1))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when no budget is left for another upstream call."""
+
+
+class Deadline:
+    """An absolute point in time plus per-call timeout caps."""
+
+    __slots__ = ("expires_at", "connect_cap", "read_cap")
+
+    def __init__(self, budget_seconds, connect_cap=5, read_cap=20, started_at=None):
+        started_at = time.time() if started_at is None else started_at
+        self.expires_at = started_at + budget_seconds
+        self.connect_cap = connect_cap
+        self.read_cap = read_cap
+
+    @classmethod
+    def from_timeout(cls, timeout):
+        """Deadline equivalent to a plain requests timeout (tuple or number)."""
+        if isinstance(timeout, tuple):
+            return cls(sum(timeout), connect_cap=timeout[0], read_cap=timeout[1])
+        return cls(timeout, connect_cap=timeout, read_cap=timeout)
+
+    def remaining(self):
+        return self.expires_at - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self):
+        """(connect, read) timeouts for the next upstream call, clipped to what is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return (min(self.connect_cap, remaining), min(self.read_cap, remaining))
+
+    def sooner(self, budget_seconds):
+        """A copy that also ends no later than budget_seconds from now."""
+        deadline = Deadline(0, self.connect_cap, self.read_cap)
+        deadline.expires_at = min(self.expires_at, time.time() + budget_seconds)
+        return deadline
+
+
+def request_deadline(headers, connect_cap=5, read_cap=20):
+    """
+    Deadline for an incoming request: the router limit minus a safety margin,
+    counted from when the Heroku router received it (X-Request-Start, in ms)
+    so time spent queued in front of gunicorn is not forgotten.
+    """
+    started_at = None
+    request_start = headers.get("X-Request-Start", "")
+    if request_start.isdigit():
+        started_at = int(request_start) / 1000.0
+        # Ignore clocks that disagree wildly with ours
+        if not 0 <= time.time() - started_at < ROUTER_LIMIT_SECONDS:
+            started_at = None
+    return Deadline(ROUTER_LIMIT_SECONDS - DEADLINE_SAFETY_SECONDS, connect_cap, read_cap,
+                    started_at=started_at)
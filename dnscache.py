@@ -0,0 +1,173 @@
+"""
+In-process DNS cache for the FPS API host.
+
+Answers are kept for the record's TTL (read with dnspython when it is
+installed, otherwise FPS_DNS_TTL), refreshed in the background shortly before
+they expire, and served stale for a grace period if a refresh fails, so a
+slow or flaky resolver never sits on the request path.
+"""
+
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+
+import metrics
+
+try:
+    import dns.resolver
+except ImportError:  # optional: without dnspython the configured TTL is used
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+DNS_DEFAULT_TTL = float(os.environ.get('FPS_DNS_TTL', 60))
+DNS_MIN_TTL = float(os.environ.get('FPS_DNS_MIN_TTL', 5))
+DNS_MAX_TTL = float(os.environ.get('FPS_DNS_MAX_TTL', 300))
+DNS_STALE_GRACE = float(os.environ.get('FPS_DNS_STALE_GRACE', 300))
+DNS_REFRESH_AHEAD = 0.8  # refresh in the background after 80% of the TTL
+
+
+class _Answer:
+    __slots__ = ("addresses", "resolved_at", "ttl", "ttl_source")
+
+    def __init__(self, addresses, ttl, ttl_source):
+        self.addresses = addresses
+        self.resolved_at = time.monotonic()
+        self.ttl = ttl
+        self.ttl_source = ttl_source
+
+
+class DNSCache:
+    """Thread-safe host -> addresses cache with TTL and refresh-ahead."""
+
+    def __init__(self, default_ttl=DNS_DEFAULT_TTL, min_ttl=DNS_MIN_TTL, max_ttl=DNS_MAX_TTL,
+                 stale_grace=DNS_STALE_GRACE):
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.stale_grace = stale_grace
+        self._answers = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stale_hits": 0, "refreshes": 0,
+                          "lookups": 0, "lookup_errors": 0}
+        self._lookup_seconds_total = 0.0
+        self._lookup_seconds_max = 0.0
+
+    def resolve(self, host, port):
+        """Return a connectable address for host (first of the cached answer)."""
+        if _is_ip(host):
+            return host
+
+        now = time.monotonic()
+        with self._lock:
+            answer = self._answers.get(host)
+            if answer is not None:
+                age = now - answer.resolved_at
+                if age <= answer.ttl:
+                    self._counters["hits"] += 1
+                    if age > answer.ttl * DNS_REFRESH_AHEAD:
+                        self._refresh_async(host, port)
+                    return answer.addresses[0]
+                self._counters["misses"] += 1
+            else:
+                self._counters["misses"] += 1
+
+        try:
+            return self._lookup(host, port).addresses[0]
+        except socket.gaierror:
+            # Resolver trouble: keep using the last answer for a grace period
+            with self._lock:
+                if answer is not None and now - answer.resolved_at <= answer.ttl + self.stale_grace:
+                    self._counters["stale_hits"] += 1
+                    return answer.addresses[0]
+            raise
+
+    def invalidate(self, host):
+        """Forget host, e.g. after its cached address refused a connection."""
+        with self._lock:
+            self._answers.pop(host, None)
+
+    def _refresh_async(self, host, port):
+        # Caller holds self._lock
+        if host in self._refreshing:
+            return
+        self._refreshing.add(host)
+        self._counters["refreshes"] += 1
+
+        def _run():
+            try:
+                self._lookup(host, port)
+            except socket.gaierror as e:
+                logger.error(f"🌐 Background DNS refresh for {host} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(host)
+
+        threading.Thread(target=_run, name=f"dns-refresh-{host}", daemon=True).start()
+
+    def _lookup(self, host, port):
+        start = time.perf_counter()
+        try:
+            addresses, ttl = _query(host, port)
+        except socket.gaierror:
+            with self._lock:
+                self._counters["lookup_errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe("dns_lookup", elapsed)
+            with self._lock:
+                self._counters["lookups"] += 1
+                self._lookup_seconds_total += elapsed
+                self._lookup_seconds_max = max(self._lookup_seconds_max, elapsed)
+
+        ttl_source = "configured" if ttl is None else "dns"
+        ttl = min(max(self.default_ttl if ttl is None else ttl, self.min_ttl), self.max_ttl)
+        answer = _Answer(addresses, ttl, ttl_source)
+        with self._lock:
+            self._answers[host] = answer
+        return answer
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["lookups"]
+            hosts = {
+                host: {
+                    "addresses": answer.addresses,
+                    "ttl_seconds": answer.ttl,
+                    "ttl_source": answer.ttl_source,
+                    "age_seconds": round(time.monotonic() - answer.resolved_at, 1),
+                }
+                for host, answer in self._answers.items()
+            }
+            return dict(
+                self._counters,
+                lookup_ms_avg=round(self._lookup_seconds_total / lookups * 1000, 2) if lookups else None,
+                lookup_ms_max=round(self._lookup_seconds_max * 1000, 2),
+                hosts=hosts,
+            )
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _query(host, port):
+    """Resolve host to (addresses, ttl); ttl is None when the resolver does not report one."""
+    if dns is not None:
+        try:
+            answer = dns.resolver.resolve(host, "A", lifetime=5)
+            return [record.address for record in answer], answer.rrset.ttl
+        except dns.exception.DNSException:
+            pass  # e.g. /etc/hosts-only names; fall back to the system resolver
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    return addresses, None
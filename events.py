@@ -0,0 +1,276 @@
+"""
+Server-sent events for perfrun status changes.
+
+One RunWatcher per run ID polls the FPS API on a background thread and fans
+the result out to every subscriber, so N clients watching a run cost one
+upstream poll. The poll interval adapts: it starts short, grows while nothing
+changes, and snaps back to the minimum as soon as something does. A watcher
+stops when its last subscriber leaves, the run reaches a terminal status or
+the FPS API rejects the run ID (4xx, e.g. an unknown run); 5xx answers,
+timeouts and an open circuit are retried with backoff.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+
+from upstream import FPSAPIError
+
+logger = logging.getLogger(__name__)
+
+EVENTS_MIN_INTERVAL_SECONDS = float(os.environ.get('FPS_EVENTS_MIN_INTERVAL', 2))
+EVENTS_MAX_INTERVAL_SECONDS = float(os.environ.get('FPS_EVENTS_MAX_INTERVAL', 30))
+EVENTS_BACKOFF = 1.5
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('FPS_EVENTS_HEARTBEAT', 15))
+SUBSCRIBER_QUEUE_SIZE = 100
+
+TERMINAL_STATUSES = frozenset(["FINISHED", "COMPLETED", "FAILED", "ABORTED", "CANCELLED", "ERROR"])
+# 4xx answers worth polling again (the rest mean the run ID will never resolve)
+RETRYABLE_CLIENT_ERRORS = frozenset([408, 429])
+
+
+def run_state(payload):
+    """The watched part of a perfrun document: status, result_status and tasks by name."""
+    perfruns = (payload or {}).get("perfruns") or [{}]
+    perfrun = perfruns[0]
+    tasks = {}
+    for index, task in enumerate(perfrun.get("perfrun_tasks") or []):
+        tasks[task.get("name", f"#{index}")] = task
+    return {
+        "status": perfrun.get("status"),
+        "result_status": perfrun.get("result_status"),
+        "tasks": tasks,
+    }
+
+
+def diff_states(old, new):
+    """Changes between two run_state() results, or None when nothing watched changed."""
+    changes = {}
+    for field in ("status", "result_status"):
+        if old[field] != new[field]:
+            changes[field] = {"from": old[field], "to": new[field]}
+    tasks = []
+    for name, task in new["tasks"].items():
+        previous = old["tasks"].get(name)
+        if previous is None:
+            tasks.append({"name": name, "change": "added", "task": task})
+        elif previous != task:
+            tasks.append({"name": name, "change": "changed", "task": task})
+    for name in old["tasks"]:
+        if name not in new["tasks"]:
+            tasks.append({"name": name, "change": "removed"})
+    if tasks:
+        changes["perfrun_tasks"] = tasks
+    return changes or None
+
+
+def format_event(event, data, event_id=None):
+    """One SSE frame."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded event queue; closed when it falls too far behind."""
+
+    def __init__(self):
+        self.events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, frame):
+        try:
+            self.events.put_nowait(frame)
+        except queue.Full:
+            self.closed = True
+
+    def frames(self, heartbeat=EVENTS_HEARTBEAT_SECONDS):
+        """Yield SSE frames, with a comment line whenever nothing happened for heartbeat seconds."""
+        while not self.closed:
+            try:
+                frame = self.events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+
+
+class RunWatcher:
+    """Polls one run ID and pushes snapshot / change / error / end events to subscribers."""
+
+    def __init__(self, run_id, fetch, on_stop, min_interval=EVENTS_MIN_INTERVAL_SECONDS,
+                 max_interval=EVENTS_MAX_INTERVAL_SECONDS):
+        self.run_id = run_id
+        self.fetch = fetch
+        self.on_stop = on_stop
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.polls = 0
+        self._state = None  # as last sent to clients
+        self._internal = None  # run_state() of the last successful poll
+        self._sequence = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def subscribe(self):
+        """Add a subscriber; it gets the current snapshot right away if there is one. None once stopped."""
+        subscription = Subscription()
+        with self._lock:
+            if self._stopped:
+                return None
+            self._subscribers.add(subscription)
+            if self._state is not None:
+                subscription.put(self._frame("snapshot", self._state))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            idle = not self._subscribers
+        if idle:
+            self._wake.set()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"events-{self.run_id}", daemon=True).start()
+
+    def _frame(self, event, data):
+        # Caller holds self._lock
+        self._sequence += 1
+        return format_event(event, dict(data, run_id=self.run_id), self._sequence)
+
+    def _publish(self, event, data):
+        with self._lock:
+            frame = self._frame(event, data)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(frame)
+            if subscription.closed:
+                self.unsubscribe(subscription)
+
+    def _poll(self):
+        """One upstream poll; returns the end event's data once the watch is over, else None."""
+        self.polls += 1
+        try:
+            state = run_state(self.fetch(self.run_id))
+        except FPSAPIError as e:
+            logger.error(f"📡 Event poll for {self.run_id} failed: {str(e)}")
+            self._publish("error", {"error": str(e), "upstream_status": e.status_code})
+            if 400 <= e.status_code < 500 and e.status_code not in RETRYABLE_CLIENT_ERRORS:
+                return {"status": None, "result_status": None, "upstream_status": e.status_code}
+            self.interval = min(self.interval * EVENTS_BACKOFF, self.max_interval)
+            return None
+        except Exception as e:
+            logger.error(f"📡 Event poll for {self.run_id} failed: {str(e)}")
+            self._publish("error", {"error": str(e)})
+            self.interval = min(self.interval * EVENTS_BACKOFF, self.max_interval)
+            return None
+
+        if self._state is None:
+            with self._lock:
+                self._state = _public(state)
+                frame = self._frame("snapshot", self._state)
+                subscribers = list(self._subscribers)
+            for subscription in subscribers:
+                subscription.put(frame)
+        else:
+            changes = diff_states(self._internal, state)
+            if changes is None:
+                self.interval = min(self.interval * EVENTS_BACKOFF, self.max_interval)
+            else:
+                self.interval = self.min_interval
+                with self._lock:
+                    self._state = _public(state)
+                self._publish("change", {"changes": changes})
+        self._internal = state
+        if state["status"] in TERMINAL_STATUSES:
+            return {"status": state["status"], "result_status": state["result_status"]}
+        return None
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        break
+                end = self._poll()
+                if end is not None:
+                    self._publish("end", end)
+                    break
+                self._wake.wait(self.interval)
+                self._wake.clear()
+        finally:
+            with self._lock:
+                self._stopped = True
+                subscribers = list(self._subscribers)
+                self._subscribers.clear()
+            for subscription in subscribers:
+                subscription.put(None)
+            self.on_stop(self)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "polls": self.polls,
+                "interval_seconds": round(self.interval, 2),
+                "status": self._state["status"] if self._state else None,
+            }
+
+
+def _public(state):
+    """run_state() as sent to clients (tasks as a list, in upstream order)."""
+    return {
+        "status": state["status"],
+        "result_status": state["result_status"],
+        "perfrun_tasks": list(state["tasks"].values()),
+    }
+
+
+class EventHub:
+    """One RunWatcher per run ID, created on first subscribe and dropped when it stops."""
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self._watchers = {}
+        self._lock = threading.Lock()
+        self._counters = {"subscriptions": 0, "watchers_started": 0}
+
+    def subscribe(self, run_id):
+        """Return (watcher, subscription) for run_id."""
+        while True:
+            with self._lock:
+                watcher = self._watchers.get(run_id)
+                created = watcher is None
+                if created:
+                    watcher = RunWatcher(run_id, self.fetch, self._stopped)
+                    self._watchers[run_id] = watcher
+                    self._counters["watchers_started"] += 1
+                self._counters["subscriptions"] += 1
+            subscription = watcher.subscribe()
+            if subscription is None:
+                # Raced with a watcher that just stopped; replace it
+                self._stopped(watcher)
+                continue
+            if created:
+                watcher.start()
+            return watcher, subscription
+
+    def _stopped(self, watcher):
+        with self._lock:
+            if self._watchers.get(watcher.run_id) is watcher:
+                del self._watchers[watcher.run_id]
+
+    def stats(self):
+        with self._lock:
+            watchers = dict(self._watchers)
+            counters = dict(self._counters)
+        return dict(counters, runs={run_id: watcher.stats() for run_id, watcher in watchers.items()})
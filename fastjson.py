@@ -0,0 +1,43 @@
+"""
+Pre-serialized JSON bodies for routes whose responses are (almost) static.
+
+The static part of a body is encoded once, at import time; per request only
+the few dynamic fields are encoded and spliced onto the end. orjson is used
+when installed, the stdlib json module otherwise.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(obj):
+    """Compact JSON as bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class StaticJSON:
+    """A JSON object body serialized once; render(**fields) appends the dynamic fields."""
+
+    __slots__ = ("_head", "_empty")
+
+    def __init__(self, static):
+        body = dumps(static)
+        self._empty = not static
+        self._head = body[:-1]  # without the closing brace
+
+    def render(self, **fields):
+        if not fields:
+            return self._head + b"}"
+        parts = [self._head]
+        separator = b"" if self._empty else b","
+        for key, value in fields.items():
+            parts.append(separator + dumps(key) + b":" + dumps(value))
+            separator = b","
+        parts.append(b"}")
+        return b"".join(parts)
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for the FPS API Client.
+
+The service spends nearly all of its time waiting on the FPS API, so workers
+use gevent green threads instead of one OS thread per request: a single
+worker can hold hundreds of in-flight upstream calls.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Worker processes per dyno (Heroku sets WEB_CONCURRENCY from the dyno size)
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Cooperative I/O; set GUNICORN_WORKER_CLASS=sync to fall back to the old model
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+
+# Per-process concurrency limit: simultaneous requests a gevent worker accepts
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 500))
+
+timeout = 120
+keepalive = 2
+max_requests = 1000
+max_requests_jitter = 100
+
+
+def on_starting(server):
+    """Start each server run with empty cross-worker metrics snapshots."""
+    import metrics  # imported lazily so the master stays free of app modules before fork
+    metrics.reset()
+
+
+def child_exit(server, worker):
+    """Keep a recycled worker's metrics by folding them into the archive."""
+    import metrics
+    metrics.archive_worker(worker.pid)
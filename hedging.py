@@ -0,0 +1,154 @@
+"""
+Hedged upstream requests.
+
+If the first attempt has not answered by the observed p95 latency, a second
+identical attempt is fired and whichever answers first wins. Hedges are only
+sent while the deadline leaves room for them and while they stay under a
+fixed fraction of all primary requests.
+
+Hedged attempts run on threads of their own (greenlets under gevent) rather
+than in a fixed pool, so hedging never caps how many upstream calls a
+worker has in flight.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from deadline import DeadlineExceeded
+from metrics import percentile
+
+HEDGING_ENABLED = os.environ.get('FPS_HEDGING', '0') == '1'
+HEDGE_MAX_RATIO = float(os.environ.get('FPS_HEDGE_MAX_RATIO', 0.1))
+HEDGE_PERCENTILE = float(os.environ.get('FPS_HEDGE_PERCENTILE', 95))
+HEDGE_MIN_SAMPLES = int(os.environ.get('FPS_HEDGE_MIN_SAMPLES', 20))
+HEDGE_MIN_DELAY_SECONDS = float(os.environ.get('FPS_HEDGE_MIN_DELAY', 0.05))
+HEDGE_WINDOW = 200
+
+
+class Hedger:
+    """Runs attempt(timeout) with an optional hedge; tracks the latency window."""
+
+    def __init__(self, enabled=HEDGING_ENABLED, max_ratio=HEDGE_MAX_RATIO, pct=HEDGE_PERCENTILE,
+                 min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY_SECONDS):
+        self.enabled = enabled
+        self.max_ratio = max_ratio
+        self.pct = pct
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        self._counters = {"primary": 0, "hedged": 0, "hedge_wins": 0, "skipped_budget": 0,
+                          "skipped_deadline": 0}
+
+    def hedge_delay(self):
+        """Observed p95 (by default) of successful attempts, or None until enough samples."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            values = sorted(self._latencies)
+        return max(percentile(values, self.pct), self.min_delay)
+
+    def _timed(self, attempt, deadline):
+        start = time.perf_counter()
+        response = attempt(deadline.timeout())
+        if response.status_code < 500:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+        return response
+
+    def _take_hedge_budget(self):
+        with self._lock:
+            if self._counters["hedged"] + 1 > self.max_ratio * self._counters["primary"]:
+                self._counters["skipped_budget"] += 1
+                return False
+            self._counters["hedged"] += 1
+            return True
+
+    def run(self, attempt, deadline):
+        """Return the first successful response of the primary attempt and (maybe) a hedge."""
+        with self._lock:
+            self._counters["primary"] += 1
+        delay = self.hedge_delay() if self.enabled else None
+        if delay is None:
+            return self._timed(attempt, deadline)
+
+        primary = _spawn(self._timed, attempt, deadline)
+        try:
+            return primary.result(timeout=min(delay, max(deadline.remaining(), 0)))
+        except FuturesTimeoutError:
+            pass
+
+        # A hedge needs at least the typical latency left in the budget to be useful
+        if deadline.remaining() < delay:
+            with self._lock:
+                self._counters["skipped_deadline"] += 1
+            return self._wait_single(primary, deadline)
+        if not self._take_hedge_budget():
+            return self._wait_single(primary, deadline)
+
+        hedge = _spawn(self._timed, attempt, deadline)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline.remaining(), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self._counters["hedge_wins"] += 1
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        for loser in pending:
+            loser.add_done_callback(_close_response)
+        raise DeadlineExceeded("Request deadline exceeded while waiting on hedged attempts")
+
+    @staticmethod
+    def _wait_single(future, deadline):
+        try:
+            return future.result(timeout=max(deadline.remaining(), 0))
+        except FuturesTimeoutError:
+            future.add_done_callback(_close_response)
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def stats(self):
+        delay = self.hedge_delay()
+        with self._lock:
+            return dict(
+                self._counters,
+                enabled=self.enabled,
+                samples=len(self._latencies),
+                hedge_delay_ms=round(delay * 1000, 1) if delay is not None else None,
+                max_ratio=self.max_ratio,
+            )
+
+
+def _spawn(fn, *args):
+    """Run fn(*args) on a new daemon thread; returns a Future for its result."""
+    future = Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_run, name="fps-hedge", daemon=True).start()
+    return future
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
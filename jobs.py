@@ -0,0 +1,249 @@
+"""
+Background job runner for slow FPS API lookups.
+
+Jobs run on a bounded thread pool so the request thread can answer with 202
+immediately instead of holding the connection against Heroku's 30s router
+limit. Finished jobs are kept for a retention window and then expire.
+
+Job states and results are written through to a SQLite store on the dyno's
+local disk, so a status poll is answered by whichever gunicorn worker it
+lands on, not only by the one running the job.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sharedstore import STORE_ERRORS, SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get('FPS_JOB_WORKERS', 4))
+JOB_MAX_PENDING = int(os.environ.get('FPS_JOB_MAX_PENDING', 32))
+JOB_RETENTION_SECONDS = float(os.environ.get('FPS_JOB_RETENTION', 600))
+# Shared by all workers on the dyno; empty keeps jobs in the accepting worker only
+JOB_DB_PATH = os.environ.get('FPS_JOB_DB', '/tmp/fps-cache/jobs.sqlite3')
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+class Job:
+    """State of a single background fetch."""
+
+    FIELDS = ("job_id", "run_id", "status", "created_at", "started_at", "finished_at", "result", "error")
+
+    def __init__(self, run_id, job_id=None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.run_id = run_id
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Job rebuilt from a JobStore row (columns in FIELDS order)."""
+        fields = dict(zip(cls.FIELDS, row))
+        job = cls(fields["run_id"], fields["job_id"])
+        job.status = fields["status"]
+        job.created_at = fields["created_at"]
+        job.started_at = fields["started_at"]
+        job.finished_at = fields["finished_at"]
+        job.result = json.loads(fields["result"]) if fields["result"] is not None else None
+        job.error = fields["error"]
+        return job
+
+    def to_row(self):
+        result = json.dumps(self.result, separators=(',', ':')) if self.result is not None else None
+        return (self.job_id, self.run_id, self.status, self.created_at, self.started_at,
+                self.finished_at, result, self.error)
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        def _iso(ts):
+            return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts)) if ts else None
+
+        data = {
+            "job_id": self.job_id,
+            "run_id": self.run_id,
+            "status": self.status,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+        }
+        if self.started_at:
+            end = self.finished_at or time.time()
+            data["execution_time_ms"] = int((end - self.started_at) * 1000)
+        if self.status == SUCCEEDED:
+            data["fps_data"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobStore(SQLiteStore):
+    """Job states and results shared by every gunicorn worker on the dyno."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        run_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        result TEXT,
+        error TEXT
+    );
+    """
+    LABEL = "Job store"
+
+    def __init__(self, path, retention, busy_timeout=2.0):
+        super().__init__(path, {"writes": 0, "reads": 0, "hits": 0, "expired": 0}, busy_timeout)
+        self.retention = retention
+
+    def put(self, job):
+        """Write the job's current state; False when the store is unavailable."""
+        try:
+            self._connection().execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(Job.FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                job.to_row())
+        except STORE_ERRORS as e:
+            self._failed("write", e)
+            return False
+        self._count("writes")
+        return True
+
+    def get(self, job_id):
+        """The stored Job for job_id, or None when unknown, expired or unreadable."""
+        self._count("reads")
+        try:
+            self.purge(time.time())
+            row = self._connection().execute(
+                f"SELECT {', '.join(Job.FIELDS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        except STORE_ERRORS as e:
+            self._failed("read", e)
+            return None
+        if row is None:
+            return None
+        self._count("hits")
+        return Job.from_row(row)
+
+    def purge(self, now):
+        """
+        Drop jobs finished more than retention seconds ago, and unfinished ones
+        created that long ago (their worker died before finishing them).
+        """
+        expired = self._connection().execute(
+            "DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < ?", (now - self.retention,)).rowcount
+        if expired:
+            self._count("expired", expired)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        try:
+            retained = self._connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        except STORE_ERRORS as e:
+            self._failed("stats", e)
+            retained = None
+        return dict(counters, path=self.path, retained=retained)
+
+
+class JobManager:
+    """
+    Bounded executor plus an expiring registry of job results: jobs accepted
+    by this worker in memory, every worker's jobs in the shared JobStore.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                 retention=JOB_RETENTION_SECONDS, db_path=JOB_DB_PATH):
+        self.max_pending = max_pending
+        self.retention = retention
+        self.store = JobStore(db_path, retention) if db_path else None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fps-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "expired": 0}
+
+    def _purge_expired(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._counters["expired"] += len(expired)
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def submit(self, run_id, fetch):
+        """Queue fetch(run_id) and return the Job; raises JobQueueFull when saturated."""
+        with self._lock:
+            self._purge_expired(time.time())
+            if self._pending() >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise JobQueueFull(f"{self.max_pending} jobs already pending")
+            job = Job(run_id)
+            self._jobs[job.job_id] = job
+            self._counters["submitted"] += 1
+
+        self._save(job)
+        self._executor.submit(self._run, job, fetch)
+        return job
+
+    def _run(self, job, fetch):
+        job.started_at = time.time()
+        job.status = RUNNING
+        self._save(job)
+        try:
+            job.result = fetch(job.run_id)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.error(f"💥 [JOB:{job.job_id}] Fetch for {job.run_id} failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            with self._lock:
+                self._counters[job.status] += 1
+
+    def _save(self, job):
+        if self.store is not None:
+            self.store.put(job)
+
+    def get(self, job_id):
+        """The job, whichever worker on the dyno accepted it; None when unknown or expired."""
+        with self._lock:
+            self._purge_expired(time.time())
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.get(job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                pending=self._pending(),
+                retained=len(self._jobs),
+                max_pending=self.max_pending,
+                retention_seconds=self.retention,
+                store=self.store.stats() if self.store is not None else None,
+            )
@@ -0,0 +1,179 @@
+"""
+Asynchronous, sampled logging.
+
+Log calls only put the record on a bounded in-memory queue; a background
+QueueListener formats and writes it to stdout. When the queue is full the
+record is dropped and counted rather than stalling the request.
+
+Each request produces one access record (method, path, status, duration plus
+whatever the route noted along the way). Successful requests are sampled at
+FPS_LOG_SAMPLE_RATE; requests that end in 4xx/5xx, and every warning or
+error logged directly, are always written. FPS_LOG_FORMAT=json switches all
+output to single-line JSON objects.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context
+
+LOG_LEVEL = os.environ.get('FPS_LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('FPS_LOG_FORMAT', 'text')
+LOG_SAMPLE_RATE = float(os.environ.get('FPS_LOG_SAMPLE_RATE', 1.0))
+LOG_QUEUE_SIZE = int(os.environ.get('FPS_LOG_QUEUE_SIZE', 10000))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+TEXT_DATEFMT = '%Y-%m-%d %H:%M:%S'
+# Already part of the access record's text message, so not repeated as key=value
+SUMMARY_FIELDS = frozenset(["request_id", "method", "path", "status", "duration_ms"])
+
+
+class TextFormatter(logging.Formatter):
+    """The classic Heroku line, with any structured fields appended as key=value."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += "".join(f" {key}={value}" for key, value in fields.items() if key not in SUMMARY_FIELDS)
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message plus structured fields."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            data.update(fields)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller and leaves formatting to the listener."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Freeze the message now (args may change later); formatting happens on the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_pipeline = {"pid": None, "handler": None, "listener": None}
+_pipeline_lock = threading.Lock()
+
+
+def configure(level=LOG_LEVEL, fmt=LOG_FORMAT, queue_size=LOG_QUEUE_SIZE, stream=None):
+    """
+    Route all logging through the queue to a background writer (once per process;
+    gunicorn workers each get their own listener thread).
+    """
+    with _pipeline_lock:
+        if _pipeline["pid"] == os.getpid():
+            return
+        formatter = JSONFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT, TEXT_DATEFMT)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(formatter)
+        log_queue = queue.Queue(maxsize=queue_size)
+        handler = NonBlockingQueueHandler(log_queue)
+        listener = QueueListener(log_queue, writer, respect_handler_level=False)
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level)
+        listener.start()
+        atexit.register(listener.stop)  # drains what is still queued
+        _pipeline.update(pid=os.getpid(), handler=handler, listener=listener)
+
+
+def stats():
+    handler = _pipeline["handler"]
+    return {
+        "format": LOG_FORMAT,
+        "sample_rate": LOG_SAMPLE_RATE,
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "access": access_log.stats(),
+    }
+
+
+class AccessLog:
+    """One structured record per request, sampled on success."""
+
+    def __init__(self, sample_rate=LOG_SAMPLE_RATE, logger_name="access"):
+        self.sample_rate = sample_rate
+        self.logger = logging.getLogger(logger_name)
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "sampled_out": 0}
+
+    def begin(self, request_id):
+        g.access_start = time.perf_counter()
+        g.access_fields = {"request_id": request_id}
+
+    def note(self, **fields):
+        """Attach fields (cache state, upstream status, ...) to the current request's record."""
+        if has_request_context() and "access_fields" in g:
+            g.access_fields.update(fields)
+
+    def finish(self, request, response):
+        """Decide on sampling and write the record once the response has been sent."""
+        if "access_fields" not in g:
+            return response
+        failed = response.status_code >= 400
+        if not failed and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self._counters["sampled_out"] += 1
+            return response
+
+        fields = dict(g.access_fields, method=request.method, path=request.full_path.rstrip("?"),
+                      status=response.status_code)
+        if response.content_length is not None:
+            fields["bytes"] = response.content_length
+        start = g.access_start
+        level = logging.WARNING if failed else logging.INFO
+
+        def _write():
+            # Runs when the body is done, so streamed responses report their full duration
+            fields["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.logger.log(level, f"📝 [REQUEST:{fields['request_id']}] {fields['method']} {fields['path']} "
+                                   f"{fields['status']} {fields['duration_ms']}ms", extra={"fields": fields})
+            with self._lock:
+                self._counters["written"] += 1
+
+        response.call_on_close(_write)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+access_log = AccessLog()
+note = access_log.note
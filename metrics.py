@@ -0,0 +1,201 @@
+"""
+Low-overhead latency histograms with a Prometheus text exposition.
+
+Each gunicorn worker records into its own in-process histograms and
+periodically writes a snapshot to FPS_METRICS_DIR. /metrics merges the
+snapshots of every worker on the dyno (plus an archive of recycled workers)
+so the numbers cover the whole dyno, not just the worker that was scraped.
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.environ.get('FPS_METRICS_DIR', '/tmp/fps-metrics')
+FLUSH_INTERVAL_SECONDS = float(os.environ.get('FPS_METRICS_FLUSH_INTERVAL', 5))
+
+# Upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+PHASE_METRIC = "fps_phase_seconds"
+PHASE_HELP = "Time spent per phase of an FPS request (dns, connect, tls, ttfb, download, parse, serialize)"
+ARCHIVE_FILE = "archive.json"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list: the ceil(pct * n / 100)-th value."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct * len(sorted_values) / 100.0) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus two adds under a lock."""
+
+    __slots__ = ("counts", "sum", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return {"counts": list(self.counts), "sum": self.sum}
+
+
+class MetricsRegistry:
+    """Per-process phase histograms plus the cross-worker snapshot files."""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._pid = None
+
+    def observe(self, phase, seconds):
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(phase, Histogram())
+            self._ensure_flusher()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = list(self._histograms.items())
+        return {phase: histogram.snapshot() for phase, histogram in histograms}
+
+    # Cross-worker aggregation
+
+    def _ensure_flusher(self):
+        # Started lazily and per process, so forked workers each get their own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"📉 Metrics flush failed: {str(e)}")
+
+    def flush(self):
+        """Write this worker's snapshot atomically to <dir>/<pid>.json."""
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(os.path.join(self.directory, f"{os.getpid()}.json"), self.snapshot())
+
+    def collect(self):
+        """Merge the snapshots of all workers (this one up to date)."""
+        try:
+            self.flush()
+            names = os.listdir(self.directory)
+        except OSError as e:
+            logger.error(f"📉 Metrics collection fell back to this worker only: {str(e)}")
+            return self.snapshot()
+
+        merged = {}
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            snapshot = _read_json(os.path.join(self.directory, name))
+            _merge(merged, snapshot)
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4) for the merged histograms."""
+        lines = [f"# HELP {PHASE_METRIC} {PHASE_HELP}", f"# TYPE {PHASE_METRIC} histogram"]
+        for phase, data in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, data["counts"]):
+                cumulative += count
+                lines.append(f'{PHASE_METRIC}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+            cumulative += data["counts"][-1]
+            lines.append(f'{PHASE_METRIC}_bucket{{phase="{phase}",le="+Inf"}} {cumulative}')
+            lines.append(f'{PHASE_METRIC}_sum{{phase="{phase}"}} {data["sum"]}')
+            lines.append(f'{PHASE_METRIC}_count{{phase="{phase}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(into, snapshot):
+    for phase, data in snapshot.items():
+        target = into.setdefault(phase, {"counts": [0] * (len(BUCKETS) + 1), "sum": 0.0})
+        for index, count in enumerate(data.get("counts", [])[:len(target["counts"])]):
+            target["counts"][index] += count
+        target["sum"] += data.get("sum", 0.0)
+    return into
+
+
+def archive_worker(pid, directory=METRICS_DIR):
+    """
+    Fold an exited worker's snapshot into the archive so its counts survive
+    worker recycling without leaving one file per dead pid. Called from the
+    gunicorn master (child_exit hook).
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    if not os.path.exists(path):
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    merged = _merge(_read_json(archive_path), _read_json(path))
+    _write_json(archive_path, merged)
+    os.remove(path)
+
+
+def reset(directory=METRICS_DIR):
+    """Drop snapshots from a previous server run (gunicorn on_starting hook)."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+
+
+registry = MetricsRegistry()
+observe = registry.observe
+timer = registry.timer
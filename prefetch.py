@@ -0,0 +1,227 @@
+"""
+Cache warming and prefetch for hot run IDs.
+
+At startup the scheduler warms the configured run IDs plus the ones clients
+asked for most recently (per the shared cache store), spread over a few
+seconds. Afterwards each tracked run is refreshed shortly before its cache
+entry goes stale: runs still in progress every FPS_PREFETCH_ACTIVE_INTERVAL,
+finished runs (status FINISHED, result_status PASSED, ...) only rarely, or
+never. Run IDs requested often enough join the set on their own and leave
+it again once nobody asks for them.
+
+Every worker runs a scheduler, but a refresh is skipped when another worker
+already refreshed the entry or holds its refresh lease.
+"""
+
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from breaker import CircuitOpenError
+from events import TERMINAL_STATUSES, run_state
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.environ.get('FPS_PREFETCH', '1') == '1'
+PREFETCH_RUN_IDS = [run_id.strip() for run_id in os.environ.get('FPS_PREFETCH_RUN_IDS', '').split(',')
+                    if run_id.strip()]
+PREFETCH_MAX_RUNS = int(os.environ.get('FPS_PREFETCH_MAX_RUNS', 20))
+# Requests within PREFETCH_IDLE_SECONDS that make a run ID worth prefetching
+PREFETCH_MIN_HITS = int(os.environ.get('FPS_PREFETCH_MIN_HITS', 3))
+PREFETCH_IDLE_SECONDS = float(os.environ.get('FPS_PREFETCH_IDLE', 3600))
+# Share of the cache TTL after which an in-progress run is refreshed
+PREFETCH_LEAD = float(os.environ.get('FPS_PREFETCH_LEAD', 0.8))
+# Empty = derived from the cache TTL / max stale; 0 = never refresh
+PREFETCH_ACTIVE_INTERVAL = os.environ.get('FPS_PREFETCH_ACTIVE_INTERVAL', '')
+PREFETCH_TERMINAL_INTERVAL = os.environ.get('FPS_PREFETCH_TERMINAL_INTERVAL', '')
+PREFETCH_JITTER = float(os.environ.get('FPS_PREFETCH_JITTER', 0.1))
+PREFETCH_WARM_SPREAD_SECONDS = float(os.environ.get('FPS_PREFETCH_WARM_SPREAD', 10))
+PREFETCH_WORKERS = int(os.environ.get('FPS_PREFETCH_WORKERS', 2))
+
+TERMINAL_RESULTS = frozenset(["PASSED", "FAILED", "ERROR"])
+MAX_CANDIDATES = 1000
+
+
+def is_terminal(payload):
+    """True once a run will not change any more (terminal status or a final result)."""
+    state = run_state(payload)
+    return state["status"] in TERMINAL_STATUSES or state["result_status"] in TERMINAL_RESULTS
+
+
+class PrefetchScheduler:
+    """Keeps a bounded set of run IDs warm in the response cache."""
+
+    def __init__(self, cache, fetch, pinned=(), max_runs=PREFETCH_MAX_RUNS, min_hits=PREFETCH_MIN_HITS,
+                 idle_seconds=PREFETCH_IDLE_SECONDS, active_interval=PREFETCH_ACTIVE_INTERVAL,
+                 terminal_interval=PREFETCH_TERMINAL_INTERVAL, jitter=PREFETCH_JITTER,
+                 warm_spread=PREFETCH_WARM_SPREAD_SECONDS, workers=PREFETCH_WORKERS,
+                 enabled=PREFETCH_ENABLED):
+        self.cache = cache
+        self.fetch = fetch
+        self.pinned = list(dict.fromkeys(pinned))
+        self.max_runs = max_runs
+        self.min_hits = min_hits
+        self.idle_seconds = idle_seconds
+        # Refresh before the entry turns stale (in progress) or falls out of the cache (terminal)
+        self.active_interval = (float(active_interval) if active_interval != ''
+                                else cache.ttl * PREFETCH_LEAD)
+        self.terminal_interval = (float(terminal_interval) if terminal_interval != ''
+                                  else (cache.ttl + cache.max_stale) * PREFETCH_LEAD)
+        self.jitter = jitter
+        self.warm_spread = warm_spread
+        self.workers = workers
+        self.enabled = enabled
+        self._runs = {}  # run_id -> {"pinned", "last_hit", "terminal", "next_at"}
+        self._candidates = {}  # run_id -> (hits, first_hit) for untracked run IDs
+        self._heap = []  # (due_at, run_id)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._executor = None
+        self._counters = {"refreshes": 0, "failures": 0, "skipped_fresh": 0, "skipped_leased": 0,
+                          "promoted": 0, "dropped_idle": 0}
+
+    def start(self):
+        """Track the pinned and recently popular run IDs and start refreshing (idempotent)."""
+        if not self.enabled or self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fps-prefetch")
+        recent = self.cache.recent_keys(self.max_runs)
+        now = time.time()
+        with self._lock:
+            for run_id in self.pinned + recent:
+                if run_id not in self._runs and len(self._runs) < self.max_runs:
+                    self._track(run_id, run_id in self.pinned, now)
+        threading.Thread(target=self._run, name="fps-prefetch-scheduler", daemon=True).start()
+        logger.info(f"🔥 Prefetch tracking {len(self._runs)} run IDs "
+                    f"({len(self.pinned)} pinned, {len(self._runs) - len(self.pinned)} recent)")
+
+    def _track(self, run_id, pinned, now):
+        # Caller holds self._lock; the first refresh lands somewhere in the warm-up spread
+        self._runs[run_id] = {"pinned": pinned, "last_hit": now, "terminal": None, "next_at": None}
+        self._schedule(run_id, now + random.uniform(0, self.warm_spread))
+
+    def _schedule(self, run_id, due_at):
+        # Caller holds self._lock
+        self._runs[run_id]["next_at"] = due_at
+        heapq.heappush(self._heap, (due_at, run_id))
+        self._wake.set()
+
+    def note_request(self, run_id):
+        """Count a client request for run_id; frequently requested ones start being prefetched."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run["last_hit"] = now
+                return
+            hits, first_hit = self._candidates.get(run_id, (0, now))
+            if now - first_hit > self.idle_seconds:
+                hits, first_hit = 0, now
+            hits += 1
+            if hits < self.min_hits or len(self._runs) >= self.max_runs or self._executor is None:
+                if len(self._candidates) >= MAX_CANDIDATES and run_id not in self._candidates:
+                    self._candidates.clear()
+                self._candidates[run_id] = (hits, first_hit)
+                return
+            self._candidates.pop(run_id, None)
+            self._counters["promoted"] += 1
+            self._track(run_id, False, now)
+
+    def _due(self, entry, terminal):
+        """When entry should be refreshed next (None = never), jittered so refreshes spread out."""
+        interval = self.terminal_interval if terminal else self.active_interval
+        if interval <= 0:
+            return None
+        return entry.fetched_at + interval * (1 - random.uniform(0, self.jitter))
+
+    def _fresh_enough(self, entry):
+        """True when entry is not due yet, e.g. because another worker just refreshed it."""
+        interval = self.terminal_interval if is_terminal(entry.payload) else self.active_interval
+        return interval <= 0 or time.time() < entry.fetched_at + interval * (1 - self.jitter)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due_at, run_id = heapq.heappop(self._heap)
+                    run = self._runs.get(run_id)
+                    # Skip heap entries superseded by a later reschedule
+                    if run is not None and run["next_at"] == due_at:
+                        run["next_at"] = None
+                        due.append(run_id)
+                wait = self._heap[0][0] - now if self._heap else None
+                self._wake.clear()
+            for run_id in due:
+                self._executor.submit(self._refresh, run_id)
+            self._wake.wait(wait)
+
+    def _refresh(self, run_id):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            if not run["pinned"] and time.time() - run["last_hit"] > self.idle_seconds:
+                del self._runs[run_id]
+                self._counters["dropped_idle"] += 1
+                return
+
+        entry = self.cache.peek(run_id)
+        retry_at = None
+        if entry is not None and self._fresh_enough(entry):
+            self._count("skipped_fresh")
+        elif not self.cache.claim_refresh(run_id):
+            self._count("skipped_leased")
+            retry_at = time.time() + self.active_interval * random.uniform(0.5, 1)
+        else:
+            try:
+                entry = self.fetch(run_id)
+                self._count("refreshes")
+            except CircuitOpenError as e:
+                retry_at = time.time() + e.retry_after + random.uniform(0, self.warm_spread)
+            except Exception as e:
+                logger.error(f"🔥 Prefetch of {run_id} failed: {str(e)}")
+                self._count("failures")
+                retry_at = time.time() + self.active_interval * random.uniform(0.5, 1)
+            finally:
+                self.cache.release_refresh(run_id)
+
+        with self._lock:
+            if run_id not in self._runs:
+                return
+            if retry_at is None:
+                run["terminal"] = is_terminal(entry.payload)
+                retry_at = self._due(entry, run["terminal"])
+            if retry_at is not None:
+                self._schedule(run_id, retry_at)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            runs = {
+                run_id: {
+                    "pinned": run["pinned"],
+                    "terminal": run["terminal"],
+                    "next_refresh_in_seconds": round(run["next_at"] - now, 1) if run["next_at"] else None,
+                }
+                for run_id, run in self._runs.items()
+            }
+            return dict(
+                self._counters,
+                enabled=self.enabled,
+                active_interval_seconds=round(self.active_interval, 1),
+                terminal_interval_seconds=round(self.terminal_interval, 1),
+                candidates=len(self._candidates),
+                runs=runs,
+            )
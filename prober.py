@@ -0,0 +1,118 @@
+"""
+Background connectivity prober for the FPS API.
+
+Runs the DNS / TCP / authenticated HEAD checks on a fixed interval and keeps
+a ring buffer of results, so /api/v1/connectivity (and anything deciding
+whether the upstream is healthy) can read rolling stats instead of probing
+on every request.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+PROBE_INTERVAL_SECONDS = float(os.environ.get('FPS_PROBE_INTERVAL', 30))
+PROBE_WINDOW = int(os.environ.get('FPS_PROBE_WINDOW', 120))
+PHASES = ("dns", "tcp", "head", "total")
+
+
+def _ms(start):
+    return int((time.perf_counter() - start) * 1000)
+
+
+class ConnectivityProber:
+    """Periodic DNS/TCP/HEAD probe of one perfrun URL with a rolling window of results."""
+
+    def __init__(self, client, run_id, interval=PROBE_INTERVAL_SECONDS, window=PROBE_WINDOW):
+        self.client = client
+        self.run_id = run_id
+        self.interval = interval
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def probe_once(self):
+        """Run one DNS -> TCP -> HEAD probe, record it and return the sample."""
+        parsed_url = urlparse(self.client.perfrun_url(self.run_id))
+        hostname = parsed_url.hostname
+        port = parsed_url.port or (443 if parsed_url.scheme == 'https' else 80)
+        sample = {
+            "timestamp": datetime.now().isoformat(),
+            "ok": False,
+            "hostname": hostname,
+            "port": port,
+        }
+        start = time.perf_counter()
+        try:
+            # Test 1: DNS Resolution
+            phase_start = time.perf_counter()
+            sample["ip_address"] = socket.gethostbyname(hostname)
+            sample["dns_ms"] = _ms(phase_start)
+
+            # Test 2: TCP Connection
+            phase_start = time.perf_counter()
+            sock = socket.create_connection((hostname, port), timeout=5)
+            sample["tcp_ms"] = _ms(phase_start)
+            sock.close()
+
+            # Test 3: HTTP HEAD (over the pooled keep-alive session)
+            phase_start = time.perf_counter()
+            response = self.client.head_perfrun(self.run_id, timeout=(3, 5))
+            sample["head_ms"] = _ms(phase_start)
+            sample["status_code"] = response.status_code
+            sample["ok"] = True
+        except Exception as e:
+            sample["error"] = str(e)
+        sample["total_ms"] = _ms(start)
+
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def start(self):
+        """Start the background probe loop (idempotent)."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="connectivity-prober", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            sample = self.probe_once()
+            if not sample["ok"]:
+                logger.error(f"🔍 Connectivity probe failed: {sample.get('error')}")
+            time.sleep(self.interval)
+
+    def latest(self):
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def summary(self):
+        """Rolling availability and p50/p95/p99 per phase over the window."""
+        with self._lock:
+            samples = list(self._samples)
+        ok_samples = [sample for sample in samples if sample["ok"]]
+        latency = {}
+        for phase in PHASES:
+            values = sorted(sample[f"{phase}_ms"] for sample in ok_samples)
+            latency[phase] = {
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+            }
+        return {
+            "samples": len(samples),
+            "window": self._samples.maxlen,
+            "interval_seconds": self.interval,
+            "availability": round(len(ok_samples) / len(samples), 4) if samples else None,
+            "latency": latency,
+        }
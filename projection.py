@@ -0,0 +1,107 @@
+"""
+Field projection and task filtering for perfrun payloads.
+
+A projection spec comes from query parameters:
+    ?fields=status,result_status,perfrun_duration,perfrun_tasks.name
+    ?task_name=Env Config,Metric Collection
+    ?task_status=FAILED
+
+Specs are compiled once per distinct combination and applied in a single pass
+over the parsed payload.
+"""
+
+import hashlib
+from functools import lru_cache
+
+TASKS_KEY = "perfrun_tasks"
+
+
+def _split(value):
+    return tuple(dict.fromkeys(part.strip() for part in value.split(",") if part.strip()))
+
+
+class Projection:
+    """A compiled projection; apply() returns a new, trimmed payload."""
+
+    __slots__ = ("fields", "task_fields", "task_names", "task_statuses", "tag")
+
+    def __init__(self, fields, task_fields, task_names, task_statuses, spec):
+        self.fields = fields              # run-level keys to keep, or None for all
+        self.task_fields = task_fields    # task-level keys to keep, or None for all
+        self.task_names = task_names      # frozenset filter, or None
+        self.task_statuses = task_statuses
+        self.tag = hashlib.sha1(spec.encode()).hexdigest()[:8]
+
+    def _task(self, task):
+        if self.task_fields is None:
+            return task
+        return {key: task[key] for key in self.task_fields if key in task}
+
+    def _tasks(self, tasks):
+        names, statuses = self.task_names, self.task_statuses
+        return [
+            self._task(task) for task in tasks
+            if (names is None or task.get("name") in names)
+            and (statuses is None or task.get("status") in statuses)
+        ]
+
+    def _run(self, run):
+        if not isinstance(run, dict):
+            return run
+        keys = run.keys() if self.fields is None else (key for key in self.fields if key in run)
+        projected = {}
+        for key in keys:
+            value = run[key]
+            if key == TASKS_KEY and isinstance(value, list):
+                value = self._tasks(value)
+            projected[key] = value
+        return projected
+
+    def apply(self, payload):
+        """Project every run of a {"perfruns": [...]} document (or a bare run dict)."""
+        if isinstance(payload, dict) and isinstance(payload.get("perfruns"), list):
+            projected = dict(payload)
+            projected["perfruns"] = [self._run(run) for run in payload["perfruns"]]
+            return projected
+        return self._run(payload)
+
+
+@lru_cache(maxsize=256)
+def compile_projection(fields="", task_name="", task_status=""):
+    """Compile a projection spec; returns None when nothing is requested."""
+    field_list = _split(fields)
+    names = _split(task_name)
+    statuses = _split(task_status)
+    if not (field_list or names or statuses):
+        return None
+
+    run_fields = None
+    task_fields = None
+    if field_list:
+        run_fields = []
+        for field in field_list:
+            head, _, sub = field.partition(".")
+            if head == TASKS_KEY and sub:
+                task_fields = (task_fields or ()) + (sub,)
+                head = TASKS_KEY
+            if head not in run_fields:
+                run_fields.append(head)
+        run_fields = tuple(run_fields)
+
+    spec = f"{','.join(field_list)}|{','.join(names)}|{','.join(statuses)}"
+    return Projection(
+        run_fields,
+        task_fields,
+        frozenset(names) or None,
+        frozenset(statuses) or None,
+        spec,
+    )
+
+
+def from_query(args):
+    """Projection for a request's query string, or None."""
+    return compile_projection(
+        args.get("fields", ""),
+        args.get("task_name", ""),
+        args.get("task_status", ""),
+    )
@@ -0,0 +1,221 @@
+"""
+SQLite-backed store shared by every gunicorn worker on a dyno.
+
+ResponseCache keeps its in-process entries in front of this store and writes
+through to it, so a recycled or newly started worker picks up the payloads
+its siblings already fetched instead of going upstream. The file lives on the
+dyno's local disk: it survives worker recycling, not a dyno restart.
+
+The store is bounded by entry count and total payload bytes; the least
+recently stored or read entries are evicted first. Refresh leases let one
+worker at a time refresh a stale run ID.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS perfruns (
+    key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    upstream_etag TEXT,
+    upstream_last_modified TEXT,
+    etag TEXT,
+    modified_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS perfruns_accessed_at ON perfruns (accessed_at);
+CREATE TABLE IF NOT EXISTS refresh_leases (
+    key TEXT PRIMARY KEY,
+    owner INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+STORE_ERRORS = (sqlite3.Error, OSError)
+ACCESS_RESOLUTION_SECONDS = 10
+ENTRY_FIELDS = ("fetched_at", "upstream_etag", "upstream_last_modified", "etag", "modified_at")
+
+
+class SQLiteStore:
+    """
+    Base for the dyno-local SQLite stores: one WAL connection per thread and
+    process, error counting and logging. Subclasses set SCHEMA, LABEL and
+    their counters.
+    """
+
+    SCHEMA = ""
+    LABEL = "Store"
+
+    def __init__(self, path, counters, busy_timeout=2.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = dict(counters, errors=0)
+
+    def _connection(self):
+        # One connection per thread and process; never reuse one across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def _failed(self, action, error):
+        self._count("errors")
+        logger.error(f"🗄️ {self.LABEL} {action} failed: {str(error)}")
+
+
+class SharedStore(SQLiteStore):
+    """Cross-process key -> payload store with LRU-ish eviction by count and bytes."""
+
+    SCHEMA = SCHEMA
+    LABEL = "Shared cache"
+
+    def __init__(self, path, max_entries, max_bytes, busy_timeout=2.0):
+        super().__init__(path, {"reads": 0, "hits": 0, "writes": 0, "evictions": 0, "leases_denied": 0},
+                         busy_timeout)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        """Return (payload, fields) for key, fields holding the CacheEntry attributes, or None."""
+        self._count("reads")
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT payload, fetched_at, upstream_etag, upstream_last_modified, etag, modified_at "
+                "FROM perfruns WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            # Eviction order only needs to be roughly right; skip the write for recently read rows
+            now = time.time()
+            conn.execute("UPDATE perfruns SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                         (now, key, now - ACCESS_RESOLUTION_SECONDS))
+        except STORE_ERRORS as e:
+            self._failed("read", e)
+            return None
+        self._count("hits")
+        return json.loads(row[0]), dict(zip(ENTRY_FIELDS, row[1:]))
+
+    def put(self, key, payload, **fields):
+        """Store payload with the given CacheEntry attributes, then evict down to the limits."""
+        body = json.dumps(payload, separators=(',', ':'))
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO perfruns (key, payload, size, fetched_at, upstream_etag, "
+                    "upstream_last_modified, etag, modified_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, body, len(body)) + tuple(fields.get(name) for name in ENTRY_FIELDS) + (now,))
+                evicted = self._evict(conn)
+        except STORE_ERRORS as e:
+            self._failed("write", e)
+            return False
+        self._count("writes")
+        if evicted:
+            self._count("evictions", evicted)
+        return True
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM perfruns").fetchone()
+        evicted = 0
+        if count <= self.max_entries and total <= self.max_bytes:
+            return evicted
+        # Oldest first; the row just written has the newest accessed_at and goes last
+        for key, size in conn.execute("SELECT key, size FROM perfruns ORDER BY accessed_at").fetchall():
+            if (count <= self.max_entries and total <= self.max_bytes) or count <= 1:
+                break
+            conn.execute("DELETE FROM perfruns WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        return evicted
+
+    def touch(self, key, fetched_at):
+        """Record a revalidation (304) so other workers see the entry as fresh too."""
+        try:
+            self._connection().execute(
+                "UPDATE perfruns SET fetched_at = MAX(fetched_at, ?), accessed_at = ? WHERE key = ?",
+                (fetched_at, time.time(), key))
+        except STORE_ERRORS as e:
+            self._failed("touch", e)
+
+    def recent_keys(self, limit):
+        """Keys by most recent access; roughly the run IDs clients asked for lately."""
+        try:
+            rows = self._connection().execute(
+                "SELECT key FROM perfruns ORDER BY accessed_at DESC LIMIT ?", (limit,)).fetchall()
+        except STORE_ERRORS as e:
+            self._failed("read", e)
+            return []
+        return [row[0] for row in rows]
+
+    def claim_refresh(self, key, lease_seconds):
+        """
+        Take the refresh lease for key. Returns False while another worker holds
+        an unexpired lease; errors fail open so refreshes never stop entirely.
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM refresh_leases WHERE key = ? AND expires_at < ?", (key, now))
+                claimed = conn.execute(
+                    "INSERT OR IGNORE INTO refresh_leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                    (key, os.getpid(), now + lease_seconds)).rowcount == 1
+        except STORE_ERRORS as e:
+            self._failed("lease", e)
+            return True
+        if not claimed:
+            self._count("leases_denied")
+        return claimed
+
+    def release_refresh(self, key):
+        try:
+            self._connection().execute(
+                "DELETE FROM refresh_leases WHERE key = ? AND owner = ?", (key, os.getpid()))
+        except STORE_ERRORS as e:
+            self._failed("lease release", e)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        try:
+            entries, total = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM perfruns").fetchone()
+        except STORE_ERRORS as e:
+            self._failed("stats", e)
+            entries = total = None
+        return dict(
+            counters,
+            path=self.path,
+            entries=entries,
+            bytes=total,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+        )
@@ -0,0 +1,55 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight call: the first
+caller (the leader) runs it, everyone else waits for and receives the same
+result or exception.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls per key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key, fn, wait_timeout=None):
+        """
+        Run fn() once for all concurrent callers of key and return its result.
+        Followers wait at most wait_timeout seconds (TimeoutError afterwards);
+        the leader always runs fn to completion.
+        """
+        with self._lock:
+            self._counters["calls"] += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self._counters["executions"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            return future.result(timeout=wait_timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, inflight=len(self._inflight))
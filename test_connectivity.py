@@ -1,13 +1,31 @@
 #!/usr/bin/env python3
 """
 Test connectivity to FPS API endpoint to diagnose timeout issues.
+
+Without arguments the checks run once each, one after another. With
+--samples N every phase (DNS, TCP, TLS, HEAD, GET) is sampled N times with
+--concurrency requests in flight, and min/p50/p95/max plus a histogram are
+reported per phase, for tuning timeouts and pool sizes:
+
+    python test_connectivity.py --samples 200 --concurrency 20
+    python test_connectivity.py --url http://127.0.0.1:8700/api/v1/perfruns/local --samples 500 --concurrency 50
+
+(the second one against bench/fake_fps.py --port 8700)
 """
 
+import argparse
+import json
+import os
 import requests
+import ssl
 import time
 import socket
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
+from metrics import percentile
+
 # Your FPS API details
 FPS_URL = "https://performance.sfproxy.core1.perf1-useast2.aws.sfdc.cl/api/v1/perfruns/2915731b-62f7-490f-bc24-2b4c583c7ff2"
 TOKEN = "eyJhbGciOiJSUzI1NiIsInR5cCIgOiAiSldUIiwia2lkIiA6ICJ6VFhTQTFRR1hrNkhFY2YxclJGVktoZVNmeEVOT3JDLUhBRlBPcmkyWm5NIn0.eyJleHAiOjE3NjAyMDAwNzYsImlhdCI6MTc1NzUyMTY3NiwianRpIjoiMWZmNTQ2ODAtZjk0MS00ZDg0LWI5NTAtZDA0NzBlNDMxYmFlIiwiaXNzIjoiaHR0cHM6Ly9xdWFudHVtay1oYS5mb3VuZGF0aW9uLnBlcmYxLXVzZWFzdDIuYXdzLnNmZGMuY2wvYXV0aC9yZWFsbXMvY2VudHJhbHBlcmZmb3VuZGF0aW9uIiwiYXVkIjoiY3BmLW1lcmxpbi1vaWRjIiwic3ViIjoiZjphMnpyZGZMN1N0NjYzUGpGMlhrQmtROnN5YXRoaXJhanUiLCJ0eXAiOiJJRCIsImF6cCI6ImNwZi1tZXJsaW4tb2lkYyIsInNpZCI6IjdhNWIzOGQ3LTA0ZDEtNDc0OC05MDc0LTMwNTE0MzhlZWFiNCIsImF0X2hhc2giOiJmTXZoSTRyWUk4VVNBUDVoajhYd1JRIiwiZW1wbG95ZWVfdHlwZSI6ImVtcGxveWVlIiwiZW1haWxfdmVyaWZpZWQiOmZhbHNlLCJyZWFsbV9hY2Nlc3MiOnsicm9sZXMiOlsib2ZmbGluZV9hY2Nlc3MiLCJkZWZhdWx0LXJvbGVzLWNlbnRyYWxwZXJmZm91bmRhdGlvbiIsInVtYV9hdXRob3JpemF0aW9uIl19LCJuYW1lIjoiU2FjaGluIFlhdGhpcmFqdSBzeWF0aGlyYWp1IiwicHJlZmVycmVkX3VzZXJuYW1lIjoic3lhdGhpcmFqdSIsImdpdmVuX25hbWUiOiJTYWNoaW4gWWF0aGlyYWp1IiwiZmFtaWx5X25hbWUiOiJzeWF0aGlyYWp1IiwiZW1haWwiOiJzeWF0aGlyYWp1QHNhbGVzZm9yY2UuY29tIiwiY2xpZW50SWRlbnRpdHkiOiJjcGYtbWVybGluLW9pZGMifQ.na2y_Xo3vwiIBY7PCf_0fLd5RENGB8F-eQV6acwUhrvy5keFlPVtv1RgXPkd5XtvhxASrlnxlmEGlNt1R2KL0BfxF-2_egOPfivsPu2XkywyYB7qmYuEv0ASYmxbh0eGsr1kSuDm2QKSkPEkSkj-gdsWM_7hnC7VpzUTUXYGFBPBMS43uBV2y7lsZwDWok5v7ZCsWjywWiKqwPX6Cspl2Wkja0dnw5IM31dTc9NdPUDVHyrLA2fHRHgyIO36gJTMqXbjZnkykstw-NR1ZbS5ttQ64wkTQvBhGe5REARvpjqj5-itEyaFavbN99WKbj9lwdVd4Zt84UxFym1V5bIn5w"
@@ -31,7 +49,7 @@ def test_tcp_connection():
     try:
         parsed_url = urlparse(FPS_URL)
         hostname = parsed_url.hostname
-        port = 443 if parsed_url.scheme == 'https' else 80
+        port = parsed_url.port or (443 if parsed_url.scheme == 'https' else 80)
         
         start_time = time.time()
         sock = socket.create_connection((hostname, port), timeout=10)
@@ -152,7 +170,224 @@ def test_connectivity_from_heroku_perspective():
         print(f"   ❌ Heroku simulation failed: {e}")
         return False
 
-def main():
+# Histogram bucket upper bounds in ms; anything slower lands in the last (+Inf) row
+HISTOGRAM_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000)
+DIAGNOSTIC_PHASES = ("dns", "tcp", "tls", "head", "get")
+
+
+class DiagnosticTarget:
+    """Where to probe and how: host/port from the URL, timeouts, and the HTTP session(s)."""
+
+    def __init__(self, url, concurrency, connect_timeout, read_timeout, keepalive):
+        parsed_url = urlparse(url)
+        self.url = url
+        self.hostname = parsed_url.hostname
+        self.tls = parsed_url.scheme == 'https'
+        self.port = parsed_url.port or (443 if self.tls else 80)
+        self.timeout = (connect_timeout, read_timeout)
+        self.keepalive = keepalive
+        self.headers = {
+            "accept": "application/json",
+            "Content-Type": "application/json",
+            "Authorization": f"bearer {TOKEN}"
+        }
+        self._shared = self._session(concurrency) if keepalive else None
+
+    def _session(self, pool_size=1):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+        session.verify = False
+        return session
+
+    def session(self):
+        """The shared keep-alive session, or a fresh one (new connection) per sample."""
+        return self._shared if self.keepalive else self._session()
+
+    def release(self, session):
+        if session is not self._shared:
+            session.close()
+
+
+def sample_dns(target):
+    start = time.perf_counter()
+    socket.getaddrinfo(target.hostname, target.port, type=socket.SOCK_STREAM)
+    return {"dns": time.perf_counter() - start}
+
+
+def sample_tcp(target):
+    start = time.perf_counter()
+    sock = socket.create_connection((target.hostname, target.port), timeout=target.timeout[0])
+    elapsed = time.perf_counter() - start
+    sock.close()
+    return {"tcp": elapsed}
+
+
+def sample_tls(target):
+    """TLS handshake time on top of a fresh TCP connection (skipped for plain HTTP)."""
+    if not target.tls:
+        return {}
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    sock = socket.create_connection((target.hostname, target.port), timeout=target.timeout[0])
+    try:
+        start = time.perf_counter()
+        with context.wrap_socket(sock, server_hostname=target.hostname):
+            return {"tls": time.perf_counter() - start}
+    finally:
+        sock.close()
+
+
+def sample_head(target):
+    session = target.session()
+    try:
+        start = time.perf_counter()
+        response = session.head(target.url, timeout=target.timeout)
+        response.close()
+        return {"head": time.perf_counter() - start}
+    finally:
+        target.release(session)
+
+
+def sample_get(target):
+    """Full GET, split into time to response headers and total time including the body."""
+    session = target.session()
+    try:
+        start = time.perf_counter()
+        response = session.get(target.url, timeout=target.timeout, stream=True)
+        headers_at = time.perf_counter()
+        response.content
+        if response.status_code >= 500:
+            raise requests.exceptions.HTTPError(f"HTTP {response.status_code}")
+        return {"get_ttfb": headers_at - start, "get_total": time.perf_counter() - start}
+    finally:
+        target.release(session)
+
+
+SAMPLERS = {"dns": sample_dns, "tcp": sample_tcp, "tls": sample_tls, "head": sample_head, "get": sample_get}
+
+
+def summarize(values, errors, elapsed):
+    """min/p50/p95/max and histogram (all in ms) of one phase's samples."""
+    values = sorted(value * 1000 for value in values)
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for value in values:
+        counts[next((index for index, bound in enumerate(HISTOGRAM_BUCKETS_MS) if value <= bound),
+                    len(HISTOGRAM_BUCKETS_MS))] += 1
+    return {
+        "samples": len(values) + sum(errors.values()),
+        "ok": len(values),
+        "errors": errors,
+        "wall_seconds": round(elapsed, 2),
+        "latency_ms": {
+            "min": round(values[0], 2) if values else None,
+            "p50": round(percentile(values, 50), 2) if values else None,
+            "p95": round(percentile(values, 95), 2) if values else None,
+            "max": round(values[-1], 2) if values else None,
+        },
+        "histogram": [
+            {"le_ms": bound, "count": count}
+            for bound, count in zip(list(HISTOGRAM_BUCKETS_MS) + ["+Inf"], counts)
+        ],
+    }
+
+
+def run_diagnostics(url, samples, concurrency, phases=DIAGNOSTIC_PHASES, connect_timeout=5,
+                    read_timeout=30, keepalive=True):
+    """Sample each phase `samples` times with `concurrency` in flight; phases run one after another."""
+    target = DiagnosticTarget(url, concurrency, connect_timeout, read_timeout, keepalive)
+    report = {"url": url, "samples": samples, "concurrency": concurrency, "keepalive": keepalive,
+              "timeout": list(target.timeout), "phases": {}}
+    for phase in phases:
+        if phase == "tls" and not target.tls:
+            continue
+        values = {}
+        errors = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(SAMPLERS[phase], target) for _ in range(samples)]
+            for future in futures:
+                try:
+                    for name, seconds in future.result().items():
+                        values.setdefault(name, []).append(seconds)
+                except Exception as e:
+                    error = type(e).__name__
+                    errors[error] = errors.get(error, 0) + 1
+        elapsed = time.perf_counter() - start
+        for name in values or [phase]:
+            report["phases"][name] = summarize(values.get(name, []), errors, elapsed)
+    return report
+
+
+def print_diagnostics(report):
+    print(f"🧪 {report['url']}  samples={report['samples']}  concurrency={report['concurrency']}  "
+          f"keepalive={'on' if report['keepalive'] else 'off'}  timeout={tuple(report['timeout'])}")
+    header = f"{'phase':<11}{'ok':>7}{'errors':>8}{'min':>10}{'p50':>10}{'p95':>10}{'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["phases"].items():
+        latency = stats["latency_ms"]
+        print(f"{name:<11}{stats['ok']:>7}{sum(stats['errors'].values()):>8}" + "".join(
+            f"{latency[key] if latency[key] is not None else '-':>10}" for key in ("min", "p50", "p95", "max")))
+    print("(latencies in ms)")
+
+    for name, stats in report["phases"].items():
+        if stats["errors"]:
+            print(f"\n❌ {name} errors: " + ", ".join(f"{error} x{count}" for error, count in stats["errors"].items()))
+        rows = stats["histogram"]
+        # Only the buckets between the first and last non-empty one
+        used = [index for index, row in enumerate(rows) if row["count"]]
+        if not used:
+            continue
+        peak = max(row["count"] for row in rows)
+        print(f"\n📊 {name}")
+        for row in rows[used[0]:used[-1] + 1]:
+            bar = "█" * max(round(40 * row["count"] / peak), 1 if row["count"] else 0)
+            print(f"   ≤{row['le_ms']:>7} ms {row['count']:>6} {bar}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FPS API connectivity diagnostics")
+    parser.add_argument("--url", default=os.environ.get("FPS_URL", FPS_URL),
+                        help="perfrun URL to probe (e.g. a local bench/fake_fps.py)")
+    parser.add_argument("--samples", type=int, default=0,
+                        help="samples per phase; 0 runs the classic one-shot checks")
+    parser.add_argument("--concurrency", type=int, default=10, help="samples in flight at once")
+    parser.add_argument("--phases", default=",".join(DIAGNOSTIC_PHASES),
+                        help=f"comma separated subset of {', '.join(DIAGNOSTIC_PHASES)}")
+    parser.add_argument("--connect-timeout", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=30.0)
+    parser.add_argument("--no-keepalive", action="store_true",
+                        help="new connection for every HEAD/GET instead of a shared pool")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    args.phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    unknown = [phase for phase in args.phases if phase not in SAMPLERS]
+    if unknown:
+        parser.error(f"unknown phases: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    global FPS_URL
+    FPS_URL = args.url
+    if args.samples > 0:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        report = run_diagnostics(args.url, args.samples, max(args.concurrency, 1), args.phases,
+                                 args.connect_timeout, args.read_timeout, not args.no_keepalive)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_diagnostics(report)
+        return
+    run_checks()
+
+
+def run_checks():
     """Run all connectivity tests."""
     print("🧪 FPS API Connectivity Diagnostic Tests")
     print("=" * 60)
@@ -0,0 +1,399 @@
+"""
+Upstream client for the FPS API.
+
+One pooled, keep-alive requests.Session per gunicorn worker, shared by every
+route that talks to the FPS API. With several base URLs configured
+(FPS_UPSTREAMS), each request goes to the fastest healthy one and fails over
+to the next on connection errors.
+"""
+
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+import metrics
+from breaker import CircuitBreaker
+from deadline import MIN_UPSTREAM_SECONDS, Deadline
+from dnscache import DNSCache
+from hedging import Hedger
+from singleflight import SingleFlight
+from upstreampool import UpstreamPool, parse_upstreams
+
+logger = logging.getLogger(__name__)
+
+FPS_BASE_URL = os.environ.get(
+    'FPS_BASE_URL', "https://performance.sfproxy.core1.perf1-useast2.aws.sfdc.cl"
+).rstrip('/')
+
+# Pool / retry tuning (per worker)
+POOL_CONNECTIONS = int(os.environ.get('FPS_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.environ.get('FPS_POOL_MAXSIZE', 16))
+MAX_RETRIES = int(os.environ.get('FPS_MAX_RETRIES', 2))
+RETRY_BACKOFF = float(os.environ.get('FPS_RETRY_BACKOFF', 0.2))
+
+# Optional pool of base URLs, "name=url,name=url"; FPS_BASE_URL alone when unset
+FPS_UPSTREAMS = os.environ.get('FPS_UPSTREAMS', '')
+UPSTREAM_HEALTH_PATH = os.environ.get('FPS_UPSTREAM_HEALTH_PATH', '/api/v1/perfruns')
+RETRY_STATUSES = frozenset([502, 503, 504])
+DEFAULT_TIMEOUT = (5, 20)  # (connect, read) - same budget the routes always used
+# Perfrun IDs are UUIDs; anything else (slashes, dots, ?, #) never reaches the FPS API
+RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9-]{1,128}")
+
+
+def is_valid_run_id(run_id):
+    """True for strings shaped like a perfrun ID (UUID or letters, digits and dashes)."""
+    return isinstance(run_id, str) and RUN_ID_PATTERN.fullmatch(run_id) is not None
+
+
+class FPSAPIError(Exception):
+    """Raised when the FPS API answers with a non-200 status."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"FPS API returned {status_code}")
+        self.status_code = status_code
+        self.message = message
+
+
+class ConnectionStats:
+    """Thread-safe counters showing how often pooled connections are reused."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.encoded_responses = 0
+        self.bytes_wire = 0
+        self.bytes_decoded = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_transfer(self, wire_bytes, decoded_bytes, encoded):
+        with self._lock:
+            self.encoded_responses += 1 if encoded else 0
+            self.bytes_wire += wire_bytes
+            self.bytes_decoded += decoded_bytes
+
+    def snapshot(self):
+        with self._lock:
+            requests_sent = self.requests
+            opened = self.connections_opened
+            wire, decoded, encoded = self.bytes_wire, self.bytes_decoded, self.encoded_responses
+        reused = max(requests_sent - opened, 0)
+        return {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / requests_sent, 3) if requests_sent else 0.0,
+            "encoded_responses": encoded,
+            "bytes_wire": wire,
+            "bytes_decoded": decoded,
+            "compression_ratio": round(wire / decoded, 3) if decoded else None,
+        }
+
+
+# Handshake time spent by the current thread's request, so TTFB can exclude it
+_handshake = threading.local()
+
+
+def _tracked_connection(base_cls, stats, resolver):
+    """
+    Build a urllib3 connection class that reports every real (re)connect,
+    resolves through the DNS cache and times its DNS, TCP connect and TLS
+    phases. TLS SNI and the Host header still use the hostname.
+    """
+    is_tls = issubclass(base_cls, HTTPSConnection)
+
+    class TrackedConnection(base_cls):
+        def _new_conn(self):
+            host = self._dns_host
+            start = time.perf_counter()
+            try:
+                self._dns_host = resolver.resolve(host, self.port)
+            except socket.gaierror:
+                pass  # let urllib3 raise its usual NameResolutionError
+            resolved = time.perf_counter()
+            try:
+                sock = super()._new_conn()
+            except Exception:
+                if self._dns_host != host:
+                    resolver.invalidate(host)  # the cached address may be gone
+                raise
+            finally:
+                self._dns_host = host
+            self._tcp_seconds = time.perf_counter() - start
+            metrics.observe("dns", resolved - start)
+            metrics.observe("connect", self._tcp_seconds - (resolved - start))
+            return sock
+
+        def connect(self):
+            stats.record_connect()
+            start = time.perf_counter()
+            super().connect()
+            elapsed = time.perf_counter() - start
+            _handshake.seconds = getattr(_handshake, "seconds", 0.0) + elapsed
+            if is_tls:
+                metrics.observe("tls", elapsed - self._tcp_seconds)
+
+    return TrackedConnection
+
+
+def _tracked_pool(base_cls, connection_cls):
+    return type(base_cls.__name__, (base_cls,), {"ConnectionCls": connection_cls})
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count TCP/TLS handshakes."""
+
+    def __init__(self, stats, resolver, **kwargs):
+        self.stats = stats
+        self.resolver = resolver
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _tracked_pool(
+                HTTPConnectionPool, _tracked_connection(HTTPConnection, self.stats, self.resolver)),
+            "https": _tracked_pool(
+                HTTPSConnectionPool, _tracked_connection(HTTPSConnection, self.stats, self.resolver)),
+        }
+
+
+def build_session(token, stats, resolver, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    Create the keep-alive session used for all FPS API traffic. The adapter
+    never retries by itself: FPSClient._send retries only while the request's
+    deadline leaves room for another attempt.
+    """
+    adapter = PooledAdapter(
+        stats,
+        resolver,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(0, read=False, raise_on_status=False),
+        pool_block=False,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = False  # Equivalent to curl -k flag
+    session.headers.update({
+        "accept": "application/json",
+        "Content-Type": "application/json",
+        "Authorization": f"bearer {token}",
+        "Connection": "keep-alive",
+        # Every coding urllib3 can decode here: gzip, deflate, plus br/zstd when their packages are installed
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+    })
+    return session
+
+
+class FPSClient:
+    """Thin wrapper around the pooled session for the FPS perfruns API."""
+
+    def __init__(self, token, base_url=None):
+        # base_url may also be a comma separated pool, like FPS_UPSTREAMS
+        self.pool = UpstreamPool(parse_upstreams(base_url or FPS_UPSTREAMS or FPS_BASE_URL))
+        self.stats = ConnectionStats()
+        self.flights = SingleFlight()
+        self.dns = DNSCache()
+        self.hedger = Hedger()
+        self.breaker = CircuitBreaker()
+        self.session = build_session(token, self.stats, self.dns)
+        self.pool.start_health_checks(self._check_upstream)
+
+    @property
+    def base_url(self):
+        """Base URL of the upstream requests currently prefer."""
+        return self.pool.preferred().base_url
+
+    def perfrun_url(self, run_id, upstream=None):
+        base_url = upstream.base_url if upstream is not None else self.base_url
+        return f"{base_url}/api/v1/perfruns/{quote(run_id, safe='')}"
+
+    def get_perfrun(self, run_id, timeout=DEFAULT_TIMEOUT, stream=False, coalesce=True,
+                    etag=None, last_modified=None, deadline=None, **kwargs):
+        """
+        GET a perfrun document; returns the raw requests.Response.
+
+        timeout caps each call; deadline (a deadline.Deadline) bounds the whole
+        thing, including retries, hedges and waiting on a coalesced request:
+        a retry is only made while the deadline still covers another attempt.
+
+        Plain GETs for the same run ID (and validators) are coalesced: concurrent
+        callers share one upstream request and its (fully read) response, and
+        that request may be hedged. Streamed responses are never shared or
+        hedged; the caller must consume or close them. Passing etag /
+        last_modified makes the request conditional, so the FPS API may answer
+        304 Not Modified.
+
+        Raises breaker.CircuitOpenError without calling the FPS API while the
+        circuit breaker is open.
+        """
+        if deadline is None:
+            deadline = Deadline.from_timeout(timeout)
+        headers = kwargs.pop("headers", None) or {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        if not coalesce or stream or kwargs:
+            return self._send(run_id, deadline.timeout(), stream, headers, deadline=deadline, **kwargs)
+
+        def _load():
+            # The body is read inside _send so followers can share the response safely
+            return self.hedger.run(
+                lambda attempt_timeout: self._send(run_id, attempt_timeout, False, headers, deadline=deadline),
+                deadline)
+
+        key = (run_id, etag, last_modified) if headers else run_id
+        return self.flights.do(key, _load, wait_timeout=max(deadline.remaining(), 0))
+
+    def _send(self, run_id, timeout, stream, headers, deadline=None, **kwargs):
+        """
+        Issue the GET, failing over between upstreams on connection errors and
+        retrying connection errors and 502/503/504 answers (FPS_MAX_RETRIES,
+        with backoff) while the deadline covers another attempt. Errors,
+        timeouts and 5xx answers count against the circuit breaker.
+        """
+        if deadline is None:
+            deadline = Deadline.from_timeout(timeout)
+        self.breaker.before_call()
+        retries = 0
+        try:
+            while True:
+                try:
+                    response = self._send_once(run_id, timeout, stream, headers, deadline, **kwargs)
+                except requests.exceptions.ConnectionError as e:
+                    backoff = self._retry_backoff(retries, deadline)
+                    if backoff is None:
+                        raise
+                    logger.warning(f"🔁 Retrying {run_id} in {backoff:.1f}s: {str(e)}")
+                else:
+                    backoff = None
+                    if response.status_code in RETRY_STATUSES:
+                        backoff = self._retry_backoff(retries, deadline)
+                    if backoff is None:
+                        break
+                    logger.warning(f"🔁 Retrying {run_id} in {backoff:.1f}s: HTTP {response.status_code}")
+                    response.close()
+                retries += 1
+                time.sleep(backoff)
+                timeout = deadline.timeout()
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    @staticmethod
+    def _retry_backoff(retries, deadline, max_retries=MAX_RETRIES, backoff_factor=RETRY_BACKOFF):
+        """Seconds to wait before the next retry, or None when no retry is left or it would not fit."""
+        if retries >= max_retries:
+            return None
+        backoff = backoff_factor * (2 ** retries)
+        if deadline.remaining() - backoff < MIN_UPSTREAM_SECONDS:
+            return None
+        return backoff
+
+    def _send_once(self, run_id, timeout, stream, headers, deadline, **kwargs):
+        """
+        One GET to the preferred upstream, failing over to the next one on
+        connection errors while the deadline allows. Outcomes count against
+        the upstream's health.
+        """
+        candidates = self.pool.candidates()
+        for attempt, upstream in enumerate(candidates):
+            try:
+                response, headers_seconds = self._get(upstream, run_id, timeout, stream, headers, **kwargs)
+                break
+            except requests.exceptions.ConnectionError as e:
+                failover = attempt + 1 < len(candidates) and not deadline.expired()
+                self.pool.record_failure(upstream, e, failover=failover)
+                if not failover:
+                    raise
+                logger.warning(f"🧭 Failing over from upstream {upstream.name}: {str(e)}")
+                timeout = deadline.timeout()
+            except Exception as e:
+                self.pool.record_failure(upstream, e)
+                raise
+        if response.status_code >= 500:
+            self.pool.record_failure(upstream, f"HTTP {response.status_code}")
+        else:
+            self.pool.record_success(upstream, headers_seconds)
+        return response
+
+    def _get(self, upstream, run_id, timeout, stream, headers, **kwargs):
+        """
+        One GET against one upstream, recording time-to-first-byte and (unless
+        streaming) download time. Returns (response, seconds to response headers).
+        """
+        self.stats.record_request()
+        _handshake.seconds = 0.0
+        start = time.perf_counter()
+        response = self.session.get(self.perfrun_url(run_id, upstream), timeout=timeout, stream=True,
+                                    headers=headers, **kwargs)
+        headers_at = time.perf_counter()
+        metrics.observe("ttfb", max(headers_at - start - _handshake.seconds, 0.0))
+        if not stream:
+            # Decoded incrementally as it is read (urllib3 streams through the decompressor)
+            self._read_body(response)
+            metrics.observe("download", time.perf_counter() - headers_at)
+            self.stats.record_transfer(response.raw.tell(), len(response.content),
+                                       "Content-Encoding" in response.headers)
+        return response, headers_at - start
+
+    @staticmethod
+    def _read_body(response):
+        """
+        Read the whole body. requests reports a read timeout while reading the
+        body as a ConnectionError; re-raise it as the ReadTimeout it is, so it
+        is neither retried nor failed over, and the routes answer 504.
+        """
+        try:
+            response.content
+        except requests.exceptions.ConnectionError as e:
+            response.close()
+            if any(isinstance(arg, ReadTimeoutError) for arg in e.args):
+                raise requests.exceptions.ReadTimeout(e, request=response.request, response=response) from e
+            raise
+
+    def _check_upstream(self, upstream):
+        """Health check for the upstream pool: HEAD round trip in seconds, raises when unhealthy."""
+        start = time.perf_counter()
+        response = self.session.head(f"{upstream.base_url}{UPSTREAM_HEALTH_PATH}", timeout=(2, 3))
+        response.close()
+        if response.status_code >= 500:
+            raise FPSAPIError(response.status_code, "Health check failed")
+        return time.perf_counter() - start
+
+    def head_perfrun(self, run_id, timeout=(3, 5), **kwargs):
+        """HEAD a perfrun document (cheap reachability check)."""
+        self.stats.record_request()
+        return self.session.head(self.perfrun_url(run_id), timeout=timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
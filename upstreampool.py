@@ -0,0 +1,205 @@
+"""
+Pool of FPS API base URLs (regions / proxies) with latency-aware selection.
+
+Every upstream keeps an EWMA of its request latency (time to response
+headers of perfrun GETs) and a health flag. Requests go to the healthy
+upstream with the lowest EWMA; an upstream is marked unhealthy after a few
+consecutive failures and comes back once a background health check (HEAD)
+succeeds.
+
+Health checks hit a different, cheap path, so their round trips are tracked
+separately and never mixed into the routing EWMA: they only seed the estimate
+of an upstream no request has measured yet, and the first real request
+replaces that seed. An idle upstream whose estimate is older than
+FPS_UPSTREAM_REMEASURE seconds gets one real request, whose latency replaces
+the outdated estimate, so traffic moves back once it is faster again.
+"""
+
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_EWMA_ALPHA = float(os.environ.get('FPS_UPSTREAM_EWMA_ALPHA', 0.3))
+UPSTREAM_FAIL_THRESHOLD = int(os.environ.get('FPS_UPSTREAM_FAIL_THRESHOLD', 3))
+UPSTREAM_HEALTH_INTERVAL_SECONDS = float(os.environ.get('FPS_UPSTREAM_HEALTH_INTERVAL', 10))
+UPSTREAM_REMEASURE_SECONDS = float(os.environ.get('FPS_UPSTREAM_REMEASURE', 300))
+
+
+def parse_upstreams(spec):
+    """
+    "name=url,name=url" (or plain "url,url") -> [(name, url)]. Unnamed entries
+    are named after their host.
+    """
+    upstreams = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = urlparse(item).hostname or item, item
+        upstreams.append((name.strip(), url.strip().rstrip("/")))
+    return upstreams
+
+
+class Upstream:
+    """One base URL with its request and health-check latency EWMAs, health and counters."""
+
+    def __init__(self, name, base_url):
+        self.name = name
+        self.base_url = base_url
+        self.ewma_seconds = None  # request latency; what routing uses
+        self.samples = 0  # requests measured into ewma_seconds (0 = at most a health-check seed)
+        self.sampled_at = 0.0  # when a request last measured it
+        self.measured_at = 0.0  # same, or when a request was last sent to re-measure it
+        self.check_ewma_seconds = None
+        self.remeasures = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.requests = 0
+        self.failures = 0
+        self.failovers = 0
+        self.checks = 0
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "ewma_ms": _ms(self.ewma_seconds),
+            "request_samples": self.samples,
+            "check_ewma_ms": _ms(self.check_ewma_seconds),
+            "requests": self.requests,
+            "failures": self.failures,
+            "failovers": self.failovers,
+            "health_checks": self.checks,
+            "remeasures": self.remeasures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class UpstreamPool:
+    """Thread-safe EWMA-latency routing with health tracking across upstreams."""
+
+    def __init__(self, upstreams, alpha=UPSTREAM_EWMA_ALPHA, fail_threshold=UPSTREAM_FAIL_THRESHOLD,
+                 health_interval=UPSTREAM_HEALTH_INTERVAL_SECONDS, remeasure=UPSTREAM_REMEASURE_SECONDS):
+        if not upstreams:
+            raise ValueError("At least one FPS upstream is required")
+        self.upstreams = [Upstream(name, url) for name, url in upstreams]
+        self.alpha = alpha
+        self.fail_threshold = fail_threshold
+        self.health_interval = health_interval
+        self.remeasure = remeasure
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def _ranked(self):
+        # Caller holds self._lock. Healthy by EWMA (unmeasured first, so they
+        # get measured), then unhealthy ones as a last resort.
+        ranked = sorted(
+            enumerate(self.upstreams),
+            key=lambda item: (not item[1].healthy,
+                              item[1].ewma_seconds if item[1].ewma_seconds is not None else -1,
+                              item[0]))
+        return [upstream for _, upstream in ranked]
+
+    def candidates(self):
+        """
+        Upstreams in the order to try them for a request. Every remeasure
+        seconds, one healthy upstream with an outdated estimate goes first so
+        this request re-measures it.
+        """
+        with self._lock:
+            ranked = self._ranked()
+            if self.remeasure > 0 and len(ranked) > 1:
+                now = time.time()
+                for upstream in ranked[1:]:
+                    if upstream.healthy and now - upstream.measured_at > self.remeasure:
+                        upstream.measured_at = now  # one request at a time re-measures it
+                        upstream.remeasures += 1
+                        ranked.remove(upstream)
+                        ranked.insert(0, upstream)
+                        break
+        return ranked
+
+    def preferred(self):
+        with self._lock:
+            return self._ranked()[0]
+
+    def record_success(self, upstream, seconds, check=False):
+        """A request (time to response headers) or health check (round trip) that succeeded."""
+        with self._lock:
+            if check:
+                upstream.checks += 1
+                upstream.check_ewma_seconds = self._ewma(upstream.check_ewma_seconds, seconds)
+                if not upstream.samples:
+                    upstream.ewma_seconds = upstream.check_ewma_seconds
+            else:
+                upstream.requests += 1
+                # A health-check seed or an outdated estimate is replaced, not averaged with
+                now = time.time()
+                outdated = not upstream.samples or (self.remeasure > 0 and now - upstream.sampled_at > self.remeasure)
+                upstream.ewma_seconds = self._ewma(None if outdated else upstream.ewma_seconds, seconds)
+                upstream.samples += 1
+                upstream.sampled_at = upstream.measured_at = now
+            upstream.consecutive_failures = 0
+            if not upstream.healthy:
+                upstream.healthy = True
+                logger.info(f"🧭 Upstream {upstream.name} is healthy again")
+
+    def record_failure(self, upstream, error, failover=False, check=False):
+        with self._lock:
+            upstream.requests += 0 if check else 1
+            upstream.checks += 1 if check else 0
+            upstream.failures += 1
+            upstream.failovers += 1 if failover else 0
+            upstream.consecutive_failures += 1
+            upstream.last_error = str(error)[:200]
+            if upstream.healthy and upstream.consecutive_failures >= self.fail_threshold:
+                upstream.healthy = False
+                logger.error(f"🧭 Upstream {upstream.name} marked unhealthy: {upstream.last_error}")
+
+    def _ewma(self, current, seconds):
+        return seconds if current is None else current + self.alpha * (seconds - current)
+
+    def start_health_checks(self, check):
+        """
+        Run check(upstream) -> seconds (raises on failure) for every upstream on
+        a background thread. Pointless with a single upstream, so skipped then.
+        """
+        if self._checker is not None or self.health_interval <= 0 or len(self.upstreams) < 2:
+            return
+        self._checker = threading.Thread(target=self._check_loop, args=(check,),
+                                         name="upstream-health", daemon=True)
+        self._checker.start()
+
+    def _check_loop(self, check):
+        while True:
+            for upstream in list(self.upstreams):
+                try:
+                    seconds = check(upstream)
+                except Exception as e:
+                    self.record_failure(upstream, e, check=True)
+                else:
+                    self.record_success(upstream, seconds, check=True)
+            time.sleep(self.health_interval)
+
+    def stats(self):
+        with self._lock:
+            upstreams = [upstream.snapshot() for upstream in self.upstreams]
+        return {
+            "preferred": self.preferred().name,
+            "health_interval_seconds": self.health_interval if len(upstreams) > 1 else None,
+            "remeasure_seconds": self.remeasure if len(upstreams) > 1 else None,
+            "upstreams": upstreams,
+        }